@@ -6,27 +6,31 @@ import os
 # Add the parent directory to sys.path to allow imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import app
-from extensions import db
-from models import User
+from app import create_cli_app
+from users import lookup_users
 
-def check_user(email):
+app = create_cli_app()  # Database only; no web app
+
+# For more than a handful of users, `flask users show <file>` reads a list and prints CSV or JSON
+
+
+def check_user(*emails):
     with app.app_context():
-        user = User.query.filter_by(email=email).first()
-        if user:
-            print(f"User Found:\n"
-                  f"Name: {user.first_name} {user.last_name}\n"
-                  f"Email: {user.email}\n"
-                  f"Role: {user.role}\n"
-                  f"Address: {user.address_line1}, {user.address_line2 or 'N/A'}, {user.city}, {user.state}, {user.zip_code}, {user.country}\n"
-                  f"Phone: {user.phone_number}")
-        else:
-            print(f"User with email '{email}' not found.")
+        for chunk in lookup_users(emails):
+            for email, user in chunk:
+                if user:
+                    print(f"User Found:\n"
+                          f"Name: {user.first_name} {user.last_name}\n"
+                          f"Email: {user.email}\n"
+                          f"Role: {user.role}\n"
+                          f"Address: {user.address_line1}, {user.address_line2 or 'N/A'}, {user.city}, {user.state}, {user.zip_code}, {user.country}\n"
+                          f"Phone: {user.phone_number}")
+                else:
+                    print(f"User with email '{email}' not found.")
 
 if __name__ == "__main__":
-    # You can pass the email as a command-line argument
-    if len(sys.argv) != 2:
-        print("Usage: python3 check_user.py <email>")
+    # You can pass one or more emails as command-line arguments
+    if len(sys.argv) < 2:
+        print("Usage: python3 check_user.py <email> [<email> ...]")
     else:
-        email = sys.argv[1]
-        check_user(email)
+        check_user(*sys.argv[1:])
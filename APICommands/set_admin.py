@@ -6,24 +6,28 @@ import os
 # Add the parent directory to sys.path to allow imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from app import app
-from extensions import db
-from models import User
+from app import create_cli_app
+from users import set_users_role
 
-def set_admin(email):
+app = create_cli_app()  # Database only; no web app
+
+# For more than a handful of users, `flask users set-role admin <file>` reads a list
+
+
+def set_admin(*emails):
     with app.app_context():
-        user = User.query.filter_by(email=email).first()
-        if user:
-            user.role = "admin"
-            db.session.commit()
-            print(f"User {user.email} has been promoted to admin.")
-        else:
-            print(f"User with email '{email}' not found.")
+        # Logged-in sessions pick up the new role through the identity invalidation
+        for result in set_users_role(emails, 'admin'):
+            if result['status'] == 'not_found':
+                print(f"User with email '{result['key']}' not found.")
+            elif result['status'] == 'unchanged':
+                print(f"User {result['email']} is already an admin.")
+            else:
+                print(f"User {result['email']} has been promoted to admin.")
 
 if __name__ == "__main__":
-    # You can pass the email as a command-line argument
-    if len(sys.argv) != 2:
-        print("Usage: python3 set_admin.py <email>")
+    # You can pass one or more emails as command-line arguments
+    if len(sys.argv) < 2:
+        print("Usage: python3 set_admin.py <email> [<email> ...]")
     else:
-        email = sys.argv[1]
-        set_admin(email)
+        set_admin(*sys.argv[1:])
@@ -1,27 +1,78 @@
 import datetime
 import jwt
 from functools import wraps
-from flask import Blueprint, request, jsonify, current_app
-from extensions import db, bcrypt
-from models import User, Product
+from flask import Blueprint, Response, request, jsonify, current_app, g, send_from_directory, stream_with_context
+from werkzeug.http import http_date
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import OrderItem, Product, StockReservation, StockShard, User
+from catalog import catalog_cache, catalog_stamp, get_product, invalidate_catalog, product_page
+from http_cache import conditional_response, make_etag
+from search import search_products
+from cart_service import cart_service, priced_current_cart
+from order_service import get_order, order_history_page, order_to_dict, place_order
+from inventory import OutOfStock, set_stock
+from config import (API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE, PRODUCT_BULK_CHUNK_SIZE, PRODUCT_BULK_MAX_ERRORS,
+                    PRODUCT_EXPORT_BATCH_SIZE)
+from pagination import parse_limit
+from auth_tokens import (issue_refresh_token, new_jti, revoke_access_token, revoke_refresh_token,
+                         rotate_refresh_token, token_revocations, token_verifier)
+from identity import invalidate_user, load_identity
+from users import change_email, create_user, find_user_by_email
+from database import read_router, replica_reads
+from sqlstats import query_budget
+from ratelimit import auth_rate_limited
+from passwords import HasherBusy, password_hasher, verify_and_upgrade
+from profiling import request_profiler
+from product_feed import EXPORT_FORMATS, FEED_FORMATS, export_products, import_products
 
 api_bp = Blueprint('api_bp', __name__, url_prefix='/api')
 
 
-def create_token(user_id, role, expires_in=3600):
+def create_token(user_id, role, expires_in=None, user=None):
     """
     Create a JWT token for the given user_id and role.
+    Tokens live ACCESS_TOKEN_TTL seconds unless `expires_in` says otherwise.
+    With JWT_USER_SNAPSHOT enabled and `user` given, the token also carries the
+    user's profile so read-only endpoints can answer without a database lookup.
     """
+    if expires_in is None:
+        expires_in = current_app.config.get('ACCESS_TOKEN_TTL', 3600)
     payload = {
         'user_id': user_id,
         'role': role,
+        'jti': new_jti(),  # Lets the token be revoked on logout
         'exp': datetime.datetime.utcnow() + datetime.timedelta(seconds=expires_in),
         'iat': datetime.datetime.utcnow()
     }
+    if user is not None and current_app.config.get('JWT_USER_SNAPSHOT'):
+        payload['usr'] = profile_snapshot(user)
     token = jwt.encode(payload, current_app.config['SECRET_KEY'], algorithm='HS256')
     return token
 
 
+def profile_snapshot(user):
+    """
+    The profile fields returned by GET /api/profile, in JSON-ready form.
+    """
+    return {
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'display_name': user.display_name,
+        'date_of_birth': http_date(user.date_of_birth) if user.date_of_birth else None,
+        'address_line1': user.address_line1,
+        'address_line2': user.address_line2,
+        'city': user.city,
+        'state': user.state,
+        'zip_code': user.zip_code,
+        'country': user.country,
+        'phone_number': user.phone_number,
+        'role': user.role,
+        'updated_at': user.updated_at.isoformat()
+    }
+
+
 def token_required(f):
     """
     Decorator to protect routes that require a valid JWT token.
@@ -37,7 +88,7 @@ def token_required(f):
             return jsonify({'error': 'Token is missing!'}), 401
 
         try:
-            data = jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+            data = token_verifier.decode(token, current_app.config['SECRET_KEY'])
             user_id = data['user_id']
             user_role = data.get('role', 'user')
         except jwt.ExpiredSignatureError:
@@ -45,10 +96,30 @@ def token_required(f):
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Invalid token!'}), 401
 
+        if token_revocations.is_revoked(data.get('jti')):
+            return jsonify({'error': 'Token has been revoked!'}), 401
+
+        g.token_claims = data
         return f(user_id, user_role, *args, **kwargs)
     return decorated
 
 
+@api_bp.errorhandler(HasherBusy)
+def api_hasher_busy(e):
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
+@api_bp.errorhandler(429)
+@api_bp.errorhandler(503)
+def api_throttled(e):
+    response = jsonify({'error': e.description})
+    if e.retry_after is not None:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response, e.code
+
+
 def admin_required(f):
     """
     Decorator to ensure that the user has admin privileges.
@@ -62,6 +133,7 @@ def admin_required(f):
 
 
 @api_bp.route('/register', methods=['POST'])
+@auth_rate_limited
 def api_register():
     """
     API endpoint to register a new user.
@@ -76,12 +148,9 @@ def api_register():
         if field not in data or not data[field]:
             return jsonify({'error': f'{field} is required'}), 400
 
-    if User.query.filter_by(email=data['email']).first():
-        return jsonify({'error': 'Email already in use'}), 400
-
-    hashed_pw = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+    hashed_pw = password_hasher.generate_password_hash(data['password'])
 
-    user = User(
+    user_id = create_user(
         email=data['email'],
         password=hashed_pw,
         first_name=data['first_name'],
@@ -97,57 +166,104 @@ def api_register():
         phone_number=data['phone_number'],
         role='user'  # Default role
     )
-
-    db.session.add(user)
-    db.session.commit()
+    if user_id is None:
+        return jsonify({'error': 'Email already in use'}), 400
 
     return jsonify({'message': 'User registered successfully'}), 201
 
 
 @api_bp.route('/login', methods=['POST'])
+@auth_rate_limited
 def api_login():
     """
     API endpoint to login a user.
     Expects JSON data with 'email' and 'password'.
-    Returns a JWT token upon successful authentication.
+    Returns a short-lived JWT access token and a refresh token upon
+    successful authentication.
     """
     data = request.get_json()
     if not data or 'email' not in data or 'password' not in data:
         return jsonify({'error': 'Email and password required'}), 400
 
-    user = User.query.filter_by(email=data['email']).first()
-    if user and bcrypt.check_password_hash(user.password, data['password']):
-        token = create_token(user.id, user.role)
-        return jsonify({'message': 'Login successful', 'token': token}), 200
+    user = find_user_by_email(data['email'])
+    if verify_and_upgrade(user, data['password']):
+        refresh_token = issue_refresh_token(user.id, current_app.config['REFRESH_TOKEN_TTL'])
+        db.session.commit()  # Also persists a rehash, if there was one
+        return jsonify(_token_response(user, refresh_token, message='Login successful')), 200
     return jsonify({'error': 'Invalid credentials'}), 401
 
 
+def _token_response(user, refresh_token, **extra):
+    return dict(extra,
+                token=create_token(user.id, user.role, user=user),
+                expires_in=current_app.config['ACCESS_TOKEN_TTL'],
+                refresh_token=refresh_token)
+
+
+@api_bp.route('/token/refresh', methods=['POST'])
+@auth_rate_limited
+def api_refresh_token():
+    """
+    API endpoint to trade a refresh token for a new access token.
+    Expects JSON data with 'refresh_token'. The refresh token is rotated:
+    the response carries a new one and the old one stops working.
+    """
+    data = request.get_json(silent=True) or {}
+    rotated = rotate_refresh_token(data.get('refresh_token'), current_app.config['REFRESH_TOKEN_TTL'])
+    if rotated is None:
+        return jsonify({'error': 'Invalid refresh token'}), 401
+    user_id, refresh_token = rotated
+    user = User.query.get(user_id)
+    if not user:
+        return jsonify({'error': 'Invalid refresh token'}), 401
+    return jsonify(_token_response(user, refresh_token)), 200
+
+
+@api_bp.route('/logout', methods=['POST'])
+@token_required
+def api_logout(user_id, user_role):
+    """
+    API endpoint to log out.
+    Revokes the access token used for the request and, when JSON data with
+    'refresh_token' is given, that refresh token and its rotations.
+    """
+    revoke_access_token(g.token_claims)
+    data = request.get_json(silent=True) or {}
+    if data.get('refresh_token'):
+        revoke_refresh_token(data['refresh_token'])
+    return jsonify({'message': 'Logged out'}), 200
+
+
 @api_bp.route('/profile', methods=['GET'])
 @token_required
+@query_budget(2)
 def api_get_profile(user_id, user_role):
     """
     API endpoint to get the profile of the authenticated user.
     Requires a valid JWT token.
+    Supports If-None-Match / If-Modified-Since.
+    Served from the token's user snapshot when it carries one and the user
+    has not changed since it was issued (checked against the cached identity).
     """
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
-    user_data = {
-        'email': user.email,
-        'first_name': user.first_name,
-        'last_name': user.last_name,
-        'display_name': user.display_name,
-        'date_of_birth': user.date_of_birth,
-        'address_line1': user.address_line1,
-        'address_line2': user.address_line2,
-        'city': user.city,
-        'state': user.state,
-        'zip_code': user.zip_code,
-        'country': user.country,
-        'phone_number': user.phone_number,
-        'role': user.role
-    }
-    return jsonify(user_data), 200
+    snapshot = g.token_claims.get('usr')
+    if snapshot is not None:
+        identity = load_identity(user_id)
+        if identity is None or snapshot['updated_at'] != identity.updated_at.isoformat():
+            snapshot = None
+    if snapshot is None:
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        snapshot = profile_snapshot(user)
+
+    def build():
+        user_data = dict(snapshot)
+        del user_data['updated_at']
+        return jsonify(user_data), 200
+
+    updated_at = datetime.datetime.fromisoformat(snapshot['updated_at'])
+    etag = make_etag('user', user_id, snapshot['updated_at'])
+    return conditional_response(etag, updated_at, build)
 
 
 @api_bp.route('/profile', methods=['PUT'])
@@ -167,10 +283,8 @@ def api_update_profile(user_id, user_role):
 
     # Update fields if present
     if 'email' in data and data['email'] != user.email:
-        # Check if new email is taken
-        if User.query.filter_by(email=data['email']).first():
+        if not change_email(user, data['email']):
             return jsonify({'error': 'Email already in use'}), 400
-        user.email = data['email']
 
     user.first_name = data.get('first_name', user.first_name)
     user.last_name = data.get('last_name', user.last_name)
@@ -186,50 +300,108 @@ def api_update_profile(user_id, user_role):
 
     # Handle password change if provided
     if 'old_password' in data and 'new_password' in data:
-        if not bcrypt.check_password_hash(user.password, data['old_password']):
+        if not password_hasher.check_password_hash(user.password, data['old_password']):
             return jsonify({'error': 'Old password is incorrect'}), 400
-        user.password = bcrypt.generate_password_hash(data['new_password']).decode('utf-8')
+        user.password = password_hasher.generate_password_hash(data['new_password'])
 
     db.session.commit()
-    return jsonify({'message': 'Profile updated successfully'}), 200
+    invalidate_user(user_id)
+    response = {'message': 'Profile updated successfully'}
+    if 'usr' in g.token_claims:
+        # The old token's snapshot is now stale; hand out one that matches
+        response['token'] = create_token(user.id, user.role, user=user)
+    return jsonify(response), 200
 
 
 @api_bp.route('/products', methods=['GET'])
+@replica_reads
+@query_budget(2)
 def api_get_products():
     """
-    API endpoint to retrieve all products.
+    API endpoint to retrieve products, one page at a time.
     Publicly accessible.
+    Query parameters:
+      sort  - id, price or name, prefix with '-' for descending (default: id)
+      limit - page size (default: API_DEFAULT_PAGE_SIZE, max: API_MAX_PAGE_SIZE)
+      after - the next_cursor value returned by the previous page
+    The ETag is derived from max(updated_at) and the product count, so unchanged
+    catalogs are answered with a bodyless 304. No Last-Modified is sent:
+    max(updated_at) alone does not change when an older product is deleted.
     """
-    products = Product.query.all()
-    product_list = []
-    for p in products:
-        product_list.append({
-            'id': p.id,
-            'name': p.name,
-            'description': p.description,
-            'price': p.price,
-            'image_url': p.image_url
-        })
-    return jsonify(product_list), 200
+    limit = parse_limit(request.args.get('limit'), API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE)
+    sort = request.args.get('sort', 'id')
+    after = request.args.get('after')
+
+    last_modified, count = catalog_stamp()
+    etag = make_etag('products', last_modified, count, sort, after, limit)
+
+    def build():
+        try:
+            products, next_cursor = product_page(sort=sort, after=after, limit=limit)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({
+            'products': products,
+            'next_cursor': next_cursor
+        }), 200
+
+    return conditional_response(etag, None, build)
 
 
 @api_bp.route('/products/<int:product_id>', methods=['GET'])
+@replica_reads
+@query_budget(1)
 def api_get_product(product_id):
     """
     API endpoint to retrieve a single product by ID.
     Publicly accessible.
+    Supports If-None-Match / If-Modified-Since.
     """
-    product = Product.query.get(product_id)
+    product = get_product(product_id)
     if not product:
         return jsonify({'error': 'Product not found'}), 404
-    product_data = {
-        'id': product.id,
-        'name': product.name,
-        'description': product.description,
-        'price': product.price,
-        'image_url': product.image_url
-    }
-    return jsonify(product_data), 200
+    last_modified = datetime.datetime.fromisoformat(product['updated_at'])
+    etag = make_etag('product', product['id'], product['updated_at'])
+    return conditional_response(etag, last_modified, lambda: (jsonify(product), 200))
+
+
+@api_bp.route('/search', methods=['GET'])
+def api_search():
+    """
+    API endpoint to search products by name and description.
+    Publicly accessible.
+    Query parameters:
+      q     - search terms, each matched as a word prefix
+      page  - 1-based page number (default: 1)
+      limit - page size (default: API_DEFAULT_PAGE_SIZE, max: API_MAX_PAGE_SIZE)
+    """
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({'error': 'q is required'}), 400
+    limit = parse_limit(request.args.get('limit'), API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE)
+    page = parse_limit(request.args.get('page'), 1, 10000)
+    products, has_more = search_products(q, page=page, limit=limit)
+    return jsonify({
+        'products': products,
+        'page': page,
+        'next_page': page + 1 if has_more else None
+    }), 200
+
+
+def _validate_stock(data):
+    """
+    Check the optional 'stock' (int >= 0, or null to stop tracking) and
+    'stock_shards' (int >= 0) fields of a product payload.
+    """
+    stock = data.get('stock')
+    if stock is not None and (not isinstance(stock, int) or isinstance(stock, bool) or stock < 0):
+        return 'Stock must be a non-negative integer or null'
+    shards = data.get('stock_shards', 0)
+    if not isinstance(shards, int) or isinstance(shards, bool) or shards < 0:
+        return 'stock_shards must be a non-negative integer'
+    if shards and 'stock' not in data:
+        return 'stock is required with stock_shards'
+    return None
 
 
 @api_bp.route('/products', methods=['POST'])
@@ -254,6 +426,10 @@ def api_create_product(user_id):
     except ValueError:
         return jsonify({'error': 'Price must be a number'}), 400
 
+    stock_error = _validate_stock(data)
+    if stock_error:
+        return jsonify({'error': stock_error}), 400
+
     product = Product(
         name=data['name'],
         description=data['description'],
@@ -261,7 +437,11 @@ def api_create_product(user_id):
         image_url=data['image_url']
     )
     db.session.add(product)
+    db.session.flush()
+    if 'stock' in data:
+        set_stock(product.id, data['stock'], data.get('stock_shards', 0))
     db.session.commit()
+    invalidate_catalog(product.id)
     return jsonify({'message': 'Product created', 'id': product.id}), 201
 
 
@@ -290,7 +470,14 @@ def api_update_product(user_id, product_id):
             return jsonify({'error': 'Price must be a number'}), 400
     product.image_url = data.get('image_url', product.image_url)
 
+    stock_error = _validate_stock(data)
+    if stock_error:
+        return jsonify({'error': stock_error}), 400
+    if 'stock' in data:
+        set_stock(product_id, data['stock'], data.get('stock_shards', 0))
+
     db.session.commit()
+    invalidate_catalog(product_id)
     return jsonify({'message': 'Product updated successfully'}), 200
 
 
@@ -301,10 +488,245 @@ def api_delete_product(user_id, product_id):
     """
     API endpoint to delete a product by ID.
     Requires a valid JWT token and admin privileges.
+    Products that orders or stock reservations refer to cannot be deleted (409).
     """
     product = Product.query.get(product_id)
     if not product:
         return jsonify({'error': 'Product not found'}), 404
+    in_use = {'error': 'Product has orders or reserved stock and cannot be deleted'}
+    if (db.session.query(OrderItem.id).filter_by(product_id=product_id).first()
+            or db.session.query(StockReservation.id).filter_by(product_id=product_id).first()):
+        return jsonify(in_use), 409
+    StockShard.query.filter_by(product_id=product_id).delete(synchronize_session=False)
     db.session.delete(product)
-    db.session.commit()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Ordered between the check and the delete
+        db.session.rollback()
+        return jsonify(in_use), 409
+    invalidate_catalog(product_id)
     return jsonify({'message': 'Product deleted successfully'}), 200
+
+
+@api_bp.route('/products/bulk', methods=['POST'])
+@token_required
+@admin_required
+def api_bulk_products(user_id):
+    """
+    API endpoint to create or update many products at once, matched on SKU.
+    Requires a valid JWT token and admin privileges.
+    The body is JSON Lines (application/x-ndjson) or CSV (text/csv, with a
+    header); every row needs sku, name, description, price and image_url and
+    may set stock. Rows are validated as they are read and upserted
+    PRODUCT_BULK_CHUNK_SIZE at a time, one transaction per chunk. Invalid rows
+    are skipped and reported by line; the response counts what was written.
+    """
+    fmt = FEED_FORMATS.get(request.mimetype)
+    if fmt is None:
+        return jsonify({'error': f"Content-Type must be one of {', '.join(FEED_FORMATS)}"}), 415
+    report = import_products(request.stream, fmt, PRODUCT_BULK_CHUNK_SIZE, PRODUCT_BULK_MAX_ERRORS)
+    if report['chunks']:
+        invalidate_catalog()
+    return jsonify(report), 400 if 'error' in report else 200
+
+
+@api_bp.route('/products/export', methods=['GET'])
+@token_required
+@admin_required
+def api_export_products(user_id):
+    """
+    API endpoint to download the whole catalog, streamed as it is read.
+    Requires a valid JWT token and admin privileges.
+    Query parameters:
+      format - ndjson (default) or csv; both can be sent back to /products/bulk
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    response = Response(stream_with_context(export_products(fmt, PRODUCT_EXPORT_BATCH_SIZE)),
+                        mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=products.{fmt}'
+    return response
+
+
+@api_bp.route('/cache/stats', methods=['GET'])
+@token_required
+@admin_required
+def api_cache_stats(user_id):
+    """
+    API endpoint to report catalog cache hit/miss/eviction counters.
+    Requires a valid JWT token and admin privileges.
+    """
+    return jsonify(catalog_cache.stats()), 200
+
+
+@api_bp.route('/auth/hasher/stats', methods=['GET'])
+@token_required
+@admin_required
+def api_hasher_stats(user_id):
+    """
+    API endpoint to report password hashing pool queue depth and latency.
+    Requires a valid JWT token and admin privileges.
+    """
+    return jsonify(password_hasher.metrics()), 200
+
+
+@api_bp.route('/db/stats', methods=['GET'])
+@token_required
+@admin_required
+def api_db_stats(user_id):
+    """
+    API endpoint to report connection pool usage, checkout waits and read routing.
+    Requires a valid JWT token and admin privileges.
+    """
+    return jsonify(read_router.stats()), 200
+
+
+@api_bp.route('/profiles', methods=['GET'])
+@token_required
+@admin_required
+def api_list_profiles(user_id):
+    """
+    API endpoint to list armed endpoints and the profile files on disk.
+    Requires a valid JWT token and admin privileges.
+    """
+    return jsonify({'active': request_profiler.active(), 'files': request_profiler.files()}), 200
+
+
+@api_bp.route('/profiles', methods=['POST'])
+@token_required
+@admin_required
+def api_start_profile(user_id):
+    """
+    API endpoint to profile a sampled fraction of an endpoint's requests.
+    Body: {"endpoint": "product_list", "sample_rate": 0.1, "requests": 50, "seconds": 300}
+    Requires a valid JWT token and admin privileges.
+    """
+    data = request.get_json() or {}
+    endpoint = data.get('endpoint')
+    if endpoint not in current_app.view_functions:
+        return jsonify({'error': f'Unknown endpoint: {endpoint}'}), 400
+    try:
+        sample_rate = float(data.get('sample_rate', 0.1))
+        requests = int(data.get('requests', 50))
+        seconds = int(data.get('seconds', 300))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'sample_rate, requests and seconds must be numbers'}), 400
+    if not 0 < sample_rate <= 1 or requests < 1 or not 0 < seconds <= 3600:
+        return jsonify({'error': 'Need 0 < sample_rate <= 1, requests >= 1 and 0 < seconds <= 3600'}), 400
+
+    request_profiler.start(endpoint, sample_rate, requests, seconds)
+    return jsonify({'message': f'Profiling {endpoint}', 'active': request_profiler.active()}), 201
+
+
+@api_bp.route('/profiles/<endpoint>', methods=['DELETE'])
+@token_required
+@admin_required
+def api_stop_profile(user_id, endpoint):
+    """
+    API endpoint to stop profiling an endpoint and write what was collected.
+    Requires a valid JWT token and admin privileges.
+    """
+    request_profiler.stop(endpoint)
+    return jsonify({'message': f'Stopped profiling {endpoint}'}), 200
+
+
+@api_bp.route('/profiles/files/<path:name>', methods=['GET'])
+@token_required
+@admin_required
+def api_download_profile(user_id, name):
+    """
+    API endpoint to download a .prof or .collapsed profile file.
+    Requires a valid JWT token and admin privileges.
+    """
+    return send_from_directory(request_profiler.directory, name, as_attachment=True)
+
+
+@api_bp.route('/cart', methods=['GET'])
+@query_budget(3)
+def api_get_cart():
+    """
+    API endpoint to retrieve the priced contents of the visitor's cart.
+    Publicly accessible.
+    """
+    priced = priced_current_cart()
+    return jsonify({
+        'items': [{
+            'product_id': item['product'].id,
+            'name': item['product'].name,
+            'price': str(item['product'].price),
+            'quantity': item['quantity'],
+            'subtotal': str(item['subtotal'])
+        } for item in priced.items],
+        'total': str(priced.total)
+    }), 200
+
+
+@api_bp.route('/orders', methods=['POST'])
+@token_required
+def api_create_order(user_id, user_role):
+    """
+    API endpoint to place an order.
+    Requires a valid JWT token and JSON data: {"items": {"<product_id>": quantity, ...}}.
+    Send an Idempotency-Key header to make retries safe; a repeated key returns
+    the original order with status 200.
+    """
+    data = request.get_json()
+    if not data or not isinstance(data.get('items'), dict) or not data['items']:
+        return jsonify({'error': 'items is required'}), 400
+
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key and len(idempotency_key) > 64:
+        return jsonify({'error': 'Idempotency-Key must be at most 64 characters'}), 400
+
+    priced = cart_service.price(data['items'])
+    if priced.missing:
+        return jsonify({'error': 'Products not found', 'product_ids': priced.missing}), 400
+    if not priced.items:
+        return jsonify({'error': 'items is required'}), 400
+
+    try:
+        order, created = place_order(user_id, priced, idempotency_key)
+    except OutOfStock as e:
+        return jsonify({'error': 'Insufficient stock', 'product_ids': e.product_ids}), 409
+    return jsonify({
+        'message': 'Order placed' if created else 'Order already placed',
+        'id': order.id,
+        'total_amount': str(order.total_amount)
+    }), 201 if created else 200
+
+
+@api_bp.route('/orders', methods=['GET'])
+@token_required
+@query_budget(3)
+def api_get_orders(user_id, user_role):
+    """
+    API endpoint to list the authenticated user's orders, newest first.
+    Requires a valid JWT token.
+    Query parameters:
+      limit - page size (default: API_DEFAULT_PAGE_SIZE, max: API_MAX_PAGE_SIZE)
+      after - the next_cursor value returned by the previous page
+    """
+    limit = parse_limit(request.args.get('limit'), API_DEFAULT_PAGE_SIZE, API_MAX_PAGE_SIZE)
+    try:
+        orders, next_cursor = order_history_page(user_id, after=request.args.get('after'), limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({
+        'orders': [order_to_dict(o) for o in orders],
+        'next_cursor': next_cursor
+    }), 200
+
+
+@api_bp.route('/orders/<int:order_id>', methods=['GET'])
+@token_required
+def api_get_order(user_id, user_role, order_id):
+    """
+    API endpoint to retrieve a single order with its items.
+    Requires a valid JWT token; users only see their own orders, admins see all.
+    """
+    order = get_order(order_id)
+    if not order or (order.user_id != user_id and user_role != 'admin'):
+        return jsonify({'error': 'Order not found'}), 404
+    return jsonify(order_to_dict(order)), 200
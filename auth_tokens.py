@@ -0,0 +1,195 @@
+# auth_tokens.py
+
+import datetime
+import hashlib
+import secrets
+import threading
+import time
+import uuid
+import jwt
+from extensions import db
+from models import RefreshToken, RevokedToken
+from cache import LRUCache, MISSING
+from invalidation import invalidation_bus
+
+
+class TokenVerifier:
+    """
+    Verifies HS256 JWTs, remembering tokens that already passed verification.
+
+    Entries are keyed by the SHA-256 digest of the token, so the cache never
+    holds bearer tokens, and live exactly until the token's `exp`; after that
+    the token goes through jwt.decode again and is rejected as expired.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.cache = LRUCache(maxsize)
+
+    def init_app(self, app):
+        self.cache = LRUCache(app.config.get('JWT_CACHE_SIZE', 10000))
+
+    def decode(self, token, secret):
+        """
+        Return the claims of a valid token; raises jwt.InvalidTokenError
+        (or a subclass such as ExpiredSignatureError) like jwt.decode.
+        """
+        key = hashlib.sha256(token.encode('utf-8')).digest()
+        claims = self.cache.get(key)
+        if claims is not MISSING:
+            return claims
+        claims = jwt.decode(token, secret, algorithms=['HS256'])
+        exp = claims.get('exp')
+        if exp is not None and self.cache.maxsize > 0:
+            ttl = exp - time.time()
+            if ttl > 0:
+                self.cache.set(key, claims, ttl=ttl)
+        return claims
+
+    def stats(self):
+        return self.cache.stats()
+
+
+token_verifier = TokenVerifier()
+
+
+def new_jti():
+    return uuid.uuid4().hex
+
+
+class RevocationList:
+    """
+    In-memory set of revoked access token ids, so token_required checks
+    revocation with a dict lookup instead of a query.
+
+    Revocations reach other workers right away through the invalidation bus;
+    in addition the set is reloaded from the revoked_token table every
+    `sync_interval` seconds, which covers workers that started later or missed
+    an event. Entries are dropped once the token they revoke has expired.
+    """
+
+    def __init__(self, sync_interval=60):
+        self.sync_interval = sync_interval
+        self._revoked = {}  # jti -> exp as a unix timestamp
+        self._lock = threading.Lock()
+        self._synced_at = None
+
+    def init_app(self, app):
+        self.sync_interval = app.config.get('REVOCATION_SYNC_INTERVAL', 60)
+        self._synced_at = None
+
+    def add(self, jti, exp):
+        with self._lock:
+            self._revoked[jti] = exp
+
+    def is_revoked(self, jti):
+        if not jti:
+            return False
+        if self._synced_at is None or time.monotonic() - self._synced_at >= self.sync_interval:
+            self.sync()
+        return jti in self._revoked
+
+    def sync(self):
+        # Claim the sync first so concurrent requests don't all run the query
+        self._synced_at = time.monotonic()
+        now = datetime.datetime.utcnow()
+        rows = (db.session.query(RevokedToken.jti, RevokedToken.expires_at)
+                .filter(RevokedToken.expires_at > now).all())
+        cutoff = time.time()
+        with self._lock:
+            revoked = {jti: exp for jti, exp in self._revoked.items() if exp > cutoff}
+            for jti, expires_at in rows:
+                revoked[jti] = expires_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+            self._revoked = revoked
+
+    def __len__(self):
+        return len(self._revoked)
+
+
+token_revocations = RevocationList()
+
+
+@invalidation_bus.subscribe
+def _on_invalidation(event):
+    if event.startswith('revoked:'):
+        _, jti, exp = event.split(':')
+        token_revocations.add(jti, float(exp))
+
+
+def revoke_access_token(claims):
+    """
+    Revoke an access token until it expires. Commits.
+    """
+    jti, exp = claims.get('jti'), claims.get('exp')
+    if not jti or not exp:
+        return
+    db.session.merge(RevokedToken(jti=jti, expires_at=datetime.datetime.utcfromtimestamp(exp)))
+    db.session.commit()
+    invalidation_bus.publish(f'revoked:{jti}:{exp}')
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+
+def issue_refresh_token(user_id, ttl, family=None):
+    """
+    Create a refresh token for a user and return it; the caller commits.
+    Only the token's digest is stored.
+    """
+    token = secrets.token_urlsafe(32)
+    db.session.add(RefreshToken(
+        token_hash=_digest(token), user_id=user_id, family=family or new_jti(),
+        expires_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl)
+    ))
+    return token
+
+
+def rotate_refresh_token(token, ttl):
+    """
+    Exchange a refresh token for a new one in the same family. Commits.
+    Returns (user_id, new_token), or None if the token is unknown, expired or
+    was already used. Presenting a used token revokes its whole family, since
+    either the client or an attacker holds a stolen copy.
+    """
+    now = datetime.datetime.utcnow()
+    row = RefreshToken.query.filter_by(token_hash=_digest(token or '')).first()
+    if row is None or row.expires_at <= now:
+        return None
+    user_id, family = row.user_id, row.family
+    claimed = (RefreshToken.query
+               .filter_by(id=row.id, used_at=None)
+               .update({'used_at': now}, synchronize_session=False))
+    if claimed != 1:
+        _revoke_family(family, now)
+        db.session.commit()
+        return None
+    new_token = issue_refresh_token(user_id, ttl, family)
+    db.session.commit()
+    return user_id, new_token
+
+
+def revoke_refresh_token(token):
+    """
+    Revoke a refresh token and every token rotated from the same login. Commits.
+    """
+    row = RefreshToken.query.filter_by(token_hash=_digest(token or '')).first()
+    if row is not None:
+        _revoke_family(row.family, datetime.datetime.utcnow())
+        db.session.commit()
+
+
+def _revoke_family(family, now):
+    (RefreshToken.query
+     .filter(RefreshToken.family == family, RefreshToken.used_at.is_(None))
+     .update({'used_at': now}, synchronize_session=False))
+
+
+def purge_expired_tokens():
+    """
+    Delete expired refresh tokens and revocations. Returns the number of rows removed.
+    """
+    now = datetime.datetime.utcnow()
+    deleted = RefreshToken.query.filter(RefreshToken.expires_at <= now).delete(synchronize_session=False)
+    deleted += RevokedToken.query.filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
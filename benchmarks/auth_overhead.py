@@ -0,0 +1,97 @@
+# benchmarks/auth_overhead.py
+"""
+Measures what authenticating an API request costs, with and without the
+verified-JWT cache and the claims-embedded user snapshot:
+
+  decode   - jwt.decode with full signature verification on every request
+  cached   - TokenVerifier cache hit (SHA-256 of the token + LRU lookup)
+  snapshot - cached verification, and GET /api/profile answered from the
+             token's user snapshot instead of a User query
+
+Usage:
+  python3 benchmarks/auth_overhead.py [--requests 10000] [--database-url sqlite:///auth_bench.sqlite3]
+
+The database is dropped and recreated, never point it at real data.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--database-url', default='sqlite:///auth_bench.sqlite3')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    import jwt
+    from sqlalchemy import event
+    from app import create_app
+    from extensions import db
+    from models import User
+    from api import create_token
+    from auth_tokens import TokenVerifier, token_verifier
+    from passwords import password_hasher
+    app = create_app()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    secret = app.config['SECRET_KEY']
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(email='bench@example.com', password=password_hasher.generate_password_hash('x'),
+                    first_name='B', last_name='B', address_line1='1 Bench St', city='C', state='S',
+                    zip_code='0', country='IL', phone_number='0')
+        db.session.add(user)
+        db.session.commit()
+        event.listen(db.engine, 'before_cursor_execute', count)
+
+        plain_token = create_token(user.id, user.role)
+        app.config['JWT_USER_SNAPSHOT'] = True
+        snapshot_token = create_token(user.id, user.role, user=user)
+        app.config['JWT_USER_SNAPSHOT'] = False
+
+    print(f"Token verification only, {args.requests} calls:")
+    verifier = TokenVerifier(maxsize=10000)
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        jwt.decode(plain_token, secret, algorithms=['HS256'])
+    decode_us = (time.perf_counter() - started) / args.requests * 1e6
+    started = time.perf_counter()
+    for _ in range(args.requests):
+        verifier.decode(plain_token, secret)
+    cached_us = (time.perf_counter() - started) / args.requests * 1e6
+    print(f"  decode  {decode_us:8.1f} us/call")
+    print(f"  cached  {cached_us:8.1f} us/call")
+
+    print(f"GET /api/profile, {args.requests} requests:")
+    client = app.test_client()
+    for mode, cache_size, token in (('decode', 0, plain_token),
+                                    ('cached', 10000, plain_token),
+                                    ('snapshot', 10000, snapshot_token)):
+        app.config['JWT_CACHE_SIZE'] = cache_size
+        token_verifier.init_app(app)
+        headers = {'Authorization': f'Bearer {token}'}
+        assert client.get('/api/profile', headers=headers).status_code == 200
+        del statements[:]
+        started = time.perf_counter()
+        for _ in range(args.requests):
+            client.get('/api/profile', headers=headers)
+        per_request = (time.perf_counter() - started) / args.requests * 1e6
+        print(f"  {mode:8s} {per_request:8.1f} us/request  "
+              f"{len(statements) / args.requests:.2f} queries/request")
+
+
+if __name__ == '__main__':
+    main()
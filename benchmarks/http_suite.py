@@ -0,0 +1,402 @@
+# benchmarks/http_suite.py
+"""
+End-to-end HTTP benchmark. Seeds a database, replays a traffic mix through
+Flask's test client (app cost only) and through a real threaded WSGI server
+in a separate process (adds sockets, HTTP parsing and cookies), and reports
+per-endpoint throughput and p50/p95/p99 latency.
+
+The built-in mix covers the home page, /products (paged by following its
+Next Page links), /product/<id>, the add-to-cart -> cart -> checkout flow,
+/api/login and /api/products CRUD.
+--traffic replays a recorded mix instead: a JSONL file of
+  {"method": "GET", "path": "/product/{product_id}", "auth": "user"|"admin"|null,
+   "json": {...} or "form": {...}, "name": "optional label"}
+where {product_id} is replaced by a random seeded product.
+
+Usage:
+  python3 benchmarks/http_suite.py [--mode both] [--iterations 300] [--concurrency 8]
+      [--output http_results.json] [--baseline benchmarks/http_baseline.json]
+      [--save-baseline] [--tolerance 0.25]
+
+Exits 1 if any request got an unexpected status, if any endpoint's p50/p95/p99
+is more than --tolerance slower (and at least --min-delta-ms) than the
+baseline, or if its throughput dropped by more than --tolerance. Baselines are
+machine-specific: record one with --save-baseline on the machine that runs
+the comparison.
+
+The database is dropped and recreated, never point it at real data.
+"""
+
+import argparse
+import html
+import http.cookiejar
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+USER = ('bench@example.com', 'bench')
+ADMIN = ('bench-admin@example.com', 'bench')
+PERCENTILES = (50, 95, 99)
+# /products pages with an `after` cursor; a browsing user follows this link
+NEXT_PAGE = re.compile(rb'href="([^"]+)">Next Page<')
+BROWSE_PAGES = 5  # pages a user reads before starting over at page 1
+
+
+def configure_env(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    # One client IP logs in hundreds of times; the limits would turn that into 429s
+    os.environ['RATELIMIT_BACKEND'] = 'off'
+    os.environ.setdefault('CACHE_INVALIDATION_BACKEND', 'memory')
+
+
+def seed(products):
+    from app import create_app
+    from extensions import db
+    from models import Order, OrderItem, Product, User
+    from passwords import password_hasher
+    from users import create_user
+    app = create_app()
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([Product(name=f'Product {i}', description=f'Bench product {i}', price=i % 90 + 0.99,
+                                    image_url='x') for i in range(products)])
+        db.session.commit()
+        for email, password in (USER, ADMIN):
+            create_user(email=email, password=password_hasher.generate_password_hash(password),
+                        first_name='B', last_name='B', address_line1='1 Bench St', city='C', state='S',
+                        zip_code='0', country='IL', phone_number='0')
+        User.query.filter_by(email=ADMIN[0]).update({'role': 'admin'})
+        # Product 1 has an order, so deleting it must be refused (see scripted_mix)
+        order = Order(user_id=User.query.filter_by(email=USER[0]).one().id, total_amount=0.99, status='Delivered')
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(OrderItem(order_id=order.id, product_id=1, quantity=1, price_at_purchase=0.99))
+        db.session.commit()
+
+
+# Drivers: one per virtual user, each with its own cookies
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, form=None, headers=None):
+        response = self.client.open(path, method=method, json=json_body, data=form, headers=headers or {})
+        return response.status_code, response.data
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPDriver:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, json_body=None, form=None, headers=None):
+        headers = dict(headers or {})
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode()
+            headers['Content-Type'] = 'application/json'
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            # Redirects and error statuses land here; both are valid responses
+            return e.code, e.read()
+
+
+# Traffic
+
+class VirtualUser:
+    """
+    Logs in once (not measured), then runs steps and records their latencies.
+    """
+
+    def __init__(self, driver, rng, product_ids):
+        self.driver = driver
+        self.rng = rng
+        self.product_ids = product_ids
+        self.products_path = '/products'
+        self.products_page = 1
+        self.tokens = {}
+        self.driver.request('POST', '/login', form={'email': USER[0], 'password': USER[1]})
+        for role, (email, password) in (('user', USER), ('admin', ADMIN)):
+            status, body = self.driver.request('POST', '/api/login', json_body={'email': email, 'password': password})
+            self.tokens[role] = json.loads(body)['token']
+
+    def call(self, results, name, method, path, auth=None, json_body=None, form=None, expect=(200, 201, 302)):
+        headers = {'Authorization': f'Bearer {self.tokens[auth]}'} if auth else None
+        started = time.perf_counter()
+        status, body = self.driver.request(method, path, json_body=json_body, form=form, headers=headers)
+        results.record(name, time.perf_counter() - started, status not in expect)
+        return status, body
+
+    def product_id(self):
+        return self.rng.choice(self.product_ids)
+
+    def browse_products(self, results):
+        """
+        Read the next /products page, following the previous page's Next link.
+        """
+        status, body = self.call(results, 'GET /products', 'GET', self.products_path)
+        match = NEXT_PAGE.search(body) if status == 200 else None
+        if match and self.products_page < BROWSE_PAGES:
+            self.products_path = html.unescape(match.group(1).decode())
+            self.products_page += 1
+        else:
+            self.products_path, self.products_page = '/products', 1
+
+
+def scripted_mix(user, results):
+    """
+    One iteration of the built-in mix, weighted roughly like storefront traffic.
+    """
+    user.call(results, 'GET /', 'GET', '/')
+    for _ in range(3):
+        user.browse_products(results)
+        user.call(results, 'GET /product/<id>', 'GET', f'/product/{user.product_id()}')
+    if user.rng.random() < 0.3:
+        for _ in range(user.rng.randint(1, 3)):
+            user.call(results, 'POST /add_to_cart/<id>', 'POST', f'/add_to_cart/{user.product_id()}',
+                      form={'quantity': 1})
+        user.call(results, 'GET /cart', 'GET', '/cart')
+        user.call(results, 'POST /checkout', 'POST', '/checkout',
+                  form={'idempotency_key': f'bench-{user.rng.getrandbits(64):x}'})
+    if user.rng.random() < 0.1:
+        user.call(results, 'POST /api/login', 'POST', '/api/login', json_body={'email': USER[0], 'password': USER[1]})
+    user.call(results, 'GET /api/products', 'GET', '/api/products')
+    if user.rng.random() < 0.1:
+        status, body = user.call(results, 'POST /api/products', 'POST', '/api/products', auth='admin',
+                                 json_body={'name': 'Bench new', 'description': 'Created by the benchmark',
+                                            'price': 9.99, 'image_url': 'x'})
+        if status == 201:
+            new_id = json.loads(body)['id']
+            user.call(results, 'GET /api/products/<id>', 'GET', f'/api/products/{new_id}')
+            user.call(results, 'PUT /api/products/<id>', 'PUT', f'/api/products/{new_id}', auth='admin',
+                      json_body={'price': 10.99})
+            user.call(results, 'DELETE /api/products/<id>', 'DELETE', f'/api/products/{new_id}', auth='admin')
+        user.call(results, 'DELETE /api/products/<ordered id>', 'DELETE', '/api/products/1', auth='admin',
+                  expect=(409,))
+
+
+def load_traffic(path):
+    with open(path) as f:
+        steps = [json.loads(line) for line in f if line.strip()]
+
+    def recorded_mix(user, results):
+        for step in steps:
+            path = step['path'].replace('{product_id}', str(user.product_id()))
+            user.call(results, step.get('name') or f"{step['method']} {step['path']}", step['method'], path,
+                      auth=step.get('auth'), json_body=step.get('json'), form=step.get('form'))
+    return recorded_mix
+
+
+class Results:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, error):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            self.errors[name] = self.errors.get(name, 0) + int(error)
+
+    def summary(self, wall_seconds):
+        endpoints = {}
+        for name, samples in sorted(self.latencies.items()):
+            samples.sort()
+            entry = {'requests': len(samples), 'errors': self.errors[name],
+                     'rps': round(len(samples) / wall_seconds, 2)}
+            for p in PERCENTILES:
+                # Nearest-rank percentile
+                entry[f'p{p}_ms'] = round(samples[max(0, -(-len(samples) * p // 100) - 1)] * 1000, 3)
+            endpoints[name] = entry
+        total = sum(len(s) for s in self.latencies.values())
+        return {'wall_seconds': round(wall_seconds, 3), 'requests': total,
+                'rps': round(total / wall_seconds, 2), 'endpoints': endpoints}
+
+
+def run(make_driver, mix, iterations, concurrency, warmup, product_ids, seed_value):
+    users = [VirtualUser(make_driver(), random.Random(seed_value + i), product_ids) for i in range(concurrency)]
+    for user in users:
+        for _ in range(warmup):
+            mix(user, Results())
+
+    results = Results()
+    per_user = [iterations // concurrency + (1 if i < iterations % concurrency else 0) for i in range(concurrency)]
+
+    def worker(user, count):
+        for _ in range(count):
+            mix(user, results)
+
+    threads = [threading.Thread(target=worker, args=(user, count)) for user, count in zip(users, per_user)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results.summary(time.perf_counter() - started)
+
+
+def start_server(port, database_url):
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', str(port),
+                               '--database-url', database_url])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/products', timeout=1).read()
+            return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError('WSGI server exited during startup')
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError('WSGI server did not start')
+
+
+def serve(port):
+    import logging
+    from werkzeug.serving import make_server
+    from app import create_app
+    app = create_app()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    Return a list of regressions of `results` against `baseline`.
+    """
+    regressions = []
+    for mode, current in results['modes'].items():
+        reference = baseline.get('modes', {}).get(mode)
+        if reference is None:
+            continue
+        for name, before in reference['endpoints'].items():
+            after = current['endpoints'].get(name)
+            if after is None:
+                continue
+            for p in PERCENTILES:
+                key = f'p{p}_ms'
+                if after[key] > before[key] * (1 + tolerance) and after[key] - before[key] >= min_delta_ms:
+                    regressions.append(f'{mode} {name} {key}: {before[key]} -> {after[key]}')
+            if after['rps'] < before['rps'] * (1 - tolerance):
+                regressions.append(f"{mode} {name} rps: {before['rps']} -> {after['rps']}")
+    return regressions
+
+
+def print_summary(mode, summary):
+    print(f"\n{mode}: {summary['requests']} requests in {summary['wall_seconds']}s ({summary['rps']} req/s)")
+    print(f"{'endpoint':28s} {'reqs':>6s} {'err':>4s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for name, e in summary['endpoints'].items():
+        print(f"{name:28s} {e['requests']:6d} {e['errors']:4d} {e['rps']:8.1f} "
+              f"{e['p50_ms']:8.2f} {e['p95_ms']:8.2f} {e['p99_ms']:8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default='sqlite:///http_bench.sqlite3')
+    parser.add_argument('--mode', choices=('test-client', 'wsgi', 'both'), default='both')
+    parser.add_argument('--iterations', type=int, default=300, help='Mix iterations per mode')
+    parser.add_argument('--warmup', type=int, default=5, help='Unmeasured iterations per virtual user')
+    parser.add_argument('--concurrency', type=int, default=8, help='Virtual users against the WSGI server')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--traffic', help='JSONL file of recorded requests to replay instead of the built-in mix')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--output', default='http_results.json')
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(__file__), 'http_baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown, 0.25 = 25%%')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore latency changes smaller than this')
+    parser.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    configure_env(args.database_url)
+    if args.serve:
+        return serve(args.serve)
+
+    seed(args.products)
+    product_ids = list(range(1, args.products + 1))
+    mix = load_traffic(args.traffic) if args.traffic else scripted_mix
+    results = {'config': {k: v for k, v in vars(args).items() if k in ('mode', 'iterations', 'concurrency',
+                                                                       'products', 'traffic', 'seed')},
+               'modes': {}}
+
+    if args.mode in ('test-client', 'both'):
+        from app import create_app
+        app = create_app()
+        # The test client runs the app in-process; one virtual user keeps the numbers free of GIL contention
+        summary = run(lambda: TestClientDriver(app), mix, args.iterations, 1, args.warmup, product_ids, args.seed)
+        results['modes']['test-client'] = summary
+        print_summary('test-client', summary)
+
+    if args.mode in ('wsgi', 'both'):
+        server = start_server(args.port, args.database_url)
+        try:
+            base_url = f'http://127.0.0.1:{args.port}'
+            summary = run(lambda: HTTPDriver(base_url), mix, args.iterations, args.concurrency, args.warmup,
+                          product_ids, args.seed)
+        finally:
+            server.terminate()
+            server.wait()
+        results['modes']['wsgi'] = summary
+        print_summary('wsgi', summary)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+    errors = [f"{mode} {name}: {e['errors']} unexpected statuses" for mode, summary in results['modes'].items()
+              for name, e in summary['endpoints'].items() if e['errors']]
+    for line in errors:
+        print(f"ERROR {line}")
+    if errors:
+        sys.exit(1)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"OK: within {args.tolerance:.0%} of the baseline")
+
+
+if __name__ == '__main__':
+    main()
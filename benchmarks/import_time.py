@@ -0,0 +1,107 @@
+# benchmarks/import_time.py
+"""
+Cold-start cost of a web worker, a CLI app and an admin script, each in a
+fresh interpreter. Reports the median wall time, the total import time from
+`python -X importtime`, and the heaviest top-level imports.
+
+Usage:
+  python3 benchmarks/import_time.py [--repeat 5] [--top 8] [--output import_time.json]
+      [--budget web=1500 --budget cli=700]
+
+Exits 1 if a scenario's median wall time exceeds its --budget (milliseconds).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SCENARIOS = {
+    'web': ['-c', 'from app import create_app; create_app()'],
+    'cli': ['-c', 'from app import create_cli_app; create_cli_app()'],
+    'check_user': [os.path.join('APICommands', 'check_user.py')],  # No argument: prints usage and exits
+}
+
+
+def parse_importtime(stderr):
+    """
+    Return {module: cumulative microseconds} for top-level imports, and the total.
+    """
+    top_level = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level after the first
+        if not name.startswith('  ', 1):
+            top_level[name.strip()] = top_level.get(name.strip(), 0) + int(cumulative)
+    return top_level, sum(top_level.values())
+
+
+def measure(args, env):
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f'{args} failed:\n{result.stderr[-2000:]}')
+    modules, total = parse_importtime(result.stderr)
+    return wall, total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='Heaviest top-level imports to list')
+    parser.add_argument('--database-url', default='sqlite://')
+    parser.add_argument('--output', help='Write the results as JSON')
+    parser.add_argument('--budget', action='append', default=[], metavar='SCENARIO=MS',
+                        help='Fail if the median wall time of SCENARIO exceeds MS')
+    args = parser.parse_args()
+
+    env = dict(os.environ, DATABASE_URL=args.database_url, CACHE_INVALIDATION_BACKEND='memory',
+               PYTHONDONTWRITEBYTECODE='1')
+    # Compile once so every measured run reads cached bytecode, as a deployed worker would
+    subprocess.run([sys.executable, '-m', 'compileall', '-q', ROOT, '-x', 'venv'], check=False)
+
+    results = {}
+    for name, scenario in SCENARIOS.items():
+        runs = [measure(scenario, env) for _ in range(args.repeat)]
+        walls = sorted(run[0] for run in runs)
+        totals = sorted(run[1] for run in runs)
+        modules = runs[len(runs) // 2][2]
+        heaviest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        results[name] = {
+            'wall_ms': round(statistics.median(walls) * 1000, 1),
+            'imports_ms': round(statistics.median(totals) / 1000, 1),
+            'modules': len(modules),
+            'heaviest': [{'module': module, 'ms': round(us / 1000, 1)} for module, us in heaviest],
+        }
+        print(f"\n{name}: {results[name]['wall_ms']} ms wall, {results[name]['imports_ms']} ms importing "
+              f"(median of {args.repeat})")
+        for entry in results[name]['heaviest']:
+            print(f"  {entry['module']:30s} {entry['ms']:8.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    for budget in args.budget:
+        name, _, limit = budget.partition('=')
+        if name in results and results[name]['wall_ms'] > float(limit):
+            failures.append(f"{name}: {results[name]['wall_ms']} ms > {limit} ms")
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
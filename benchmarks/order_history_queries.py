@@ -0,0 +1,77 @@
+# benchmarks/order_history_queries.py
+"""
+Checks that loading a page of order history costs a constant number of SQL
+queries, however many orders and items per order there are.
+
+Usage:
+  python3 benchmarks/order_history_queries.py [--database-url sqlite:///order_bench.sqlite3]
+
+The database is dropped and recreated, never point it at real data.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default='sqlite:///order_bench.sqlite3')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    from sqlalchemy import event
+    from app import create_app
+    from extensions import db
+    from models import User, Product, Order, OrderItem
+    from order_service import order_history_page, order_to_dict
+    app = create_app()
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    results = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', count)
+        for orders, items in ((1, 1), (10, 5), (50, 20)):
+            db.drop_all()
+            db.create_all()
+            user = User(email='bench@example.com', password='x', first_name='B', last_name='B',
+                        address_line1='1 Bench St', city='C', state='S', zip_code='0',
+                        country='IL', phone_number='0')
+            products = [Product(name=f'P{i}', description='d', price=1, image_url='x') for i in range(items)]
+            db.session.add(user)
+            db.session.add_all(products)
+            db.session.flush()
+            for _ in range(orders):
+                order = Order(user_id=user.id, total_amount=items)
+                db.session.add(order)
+                db.session.flush()
+                db.session.add_all([OrderItem(order_id=order.id, product_id=p.id, quantity=1,
+                                              price_at_purchase=1) for p in products])
+            db.session.commit()
+            user_id = user.id
+            db.session.expunge_all()
+
+            del statements[:]
+            page, _ = order_history_page(user_id, limit=orders)
+            payload = [order_to_dict(o) for o in page]
+            assert sum(len(o['items']) for o in payload) == orders * items
+            results.append((orders, items, len(statements)))
+            print(f"orders={orders} items/order={items} queries={len(statements)}")
+            # The next size recreates the tables and reuses these ids
+            db.session.remove()
+
+    if len({queries for _, _, queries in results}) != 1:
+        print("FAIL: query count grows with the number of orders/items")
+        sys.exit(1)
+    print("OK: constant query count")
+
+
+if __name__ == '__main__':
+    main()
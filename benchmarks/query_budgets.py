@@ -0,0 +1,107 @@
+# benchmarks/query_budgets.py
+"""
+Requests every view that declares a @query_budget, with cold caches, and
+fails if any of them runs more queries than its budget or answers with an
+error. Prints the Server-Timing header of each response. A last request
+with a budget of zero checks that a breach is actually caught.
+
+Usage:
+  python3 benchmarks/query_budgets.py [--database-url sqlite:///budget_bench.sqlite3]
+
+The database is dropped and recreated, never point it at real data.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default='sqlite:///budget_bench.sqlite3')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    os.environ['SQL_INSTRUMENTATION'] = 'true'
+    os.environ['SQL_QUERY_BUDGET_STRICT'] = 'true'
+    os.environ['PASSWORD_HASH_WORKERS'] = '0'
+    os.environ['BCRYPT_LOG_ROUNDS'] = '4'
+    from app import create_app
+    from extensions import db
+    from models import Product
+    from catalog import catalog_cache
+    from identity import identity_cache
+    from auth_tokens import token_revocations
+    from passwords import password_hasher
+    from search import memory_index
+    from users import create_user
+    from sqlstats import QueryBudgetExceeded
+    # TESTING lets QueryBudgetExceeded reach the client instead of becoming a 500
+    app = create_app({'TESTING': True})
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([Product(name=f'Product {i}', description=f'Bench product {i}', price=i + 0.99,
+                                    image_url='x') for i in range(50)])
+        db.session.commit()
+        create_user(email='bench@example.com', password=password_hasher.generate_password_hash('bench'),
+                    first_name='B', last_name='B', address_line1='1 Bench St', city='C', state='S',
+                    zip_code='0', country='IL', phone_number='0')
+
+    client = app.test_client()
+    client.post('/login', data={'email': 'bench@example.com', 'password': 'bench'})
+    for product_id in (1, 2, 3):
+        client.post(f'/add_to_cart/{product_id}', data={'quantity': 1})
+    client.post('/checkout', data={'idempotency_key': 'bench'})
+    for product_id in (1, 2, 3):
+        client.post(f'/add_to_cart/{product_id}', data={'quantity': 1})
+    token = client.post('/api/login', json={'email': 'bench@example.com', 'password': 'bench'}).get_json()['token']
+    api_headers = {'Authorization': f'Bearer {token}'}
+
+    def check(path):
+        """
+        Request `path` with cold caches; return why it failed, or None.
+        """
+        catalog_cache.bump()
+        catalog_cache.products.clear()
+        identity_cache.clear()
+        memory_index.mark_stale()
+        token_revocations.init_app(app)
+        try:
+            response = client.get(path, headers=api_headers if path.startswith('/api/') else {})
+        except QueryBudgetExceeded as e:
+            return str(e)
+        print(f"{path:20s} {response.status_code} {', '.join(response.headers.getlist('Server-Timing'))}")
+        if response.status_code >= 400:
+            return f'status {response.status_code}'
+        return None
+
+    failures = []
+    for path in ('/', '/products', '/products?q=bench', '/product/1', '/cart', '/checkout', '/profile',
+                 '/api/products', '/api/products/1', '/api/cart', '/api/orders', '/api/profile'):
+        error = check(path)
+        if error:
+            print(f"{path:20s} FAIL {error}")
+            failures.append(path)
+
+    # A view over budget must fail this script, or a green run proves nothing
+    view = app.view_functions['api_bp.api_get_product']
+    budget, view.query_budget = view.query_budget, 0
+    try:
+        if check('/api/products/1') is None:
+            print("FAIL a view over its query budget was not caught")
+            failures.append('self-check')
+    finally:
+        view.query_budget = budget
+
+    if failures:
+        sys.exit(1)
+    print("OK: every view within its query budget")
+
+
+if __name__ == '__main__':
+    main()
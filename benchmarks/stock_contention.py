@@ -0,0 +1,109 @@
+# benchmarks/stock_contention.py
+"""
+Hammers one product's stock from many threads and checks nothing is oversold.
+
+Usage:
+  python3 benchmarks/stock_contention.py [--threads 32] [--stock 2000] [--shards 0]
+                                         [--database-url sqlite:///stock_bench.sqlite3]
+
+The database is dropped and recreated, never point it at real data.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--stock', type=int, default=2000)
+    parser.add_argument('--quantity', type=int, default=1, help='units taken per reservation')
+    parser.add_argument('--shards', type=int, default=0, help='spread stock over this many shard rows')
+    parser.add_argument('--database-url', default='sqlite:///stock_bench.sqlite3')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = args.database_url
+    from app import create_app
+    from extensions import db
+    from models import Product
+    from inventory import OutOfStock, available_stock, reserve, reserve_sharded, set_stock
+    app = create_app()
+
+    if args.database_url.startswith('sqlite'):
+        # Writers queue on SQLite's database lock instead of failing straight away
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'].setdefault('connect_args', {})['timeout'] = 60
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        product = Product(name='Flash Sale Serum', description='Limited drop', price=9.99,
+                          image_url='/static/img/product1.jpg')
+        db.session.add(product)
+        db.session.flush()
+        set_stock(product.id, args.stock, args.shards)
+        db.session.commit()
+        product_id = product.id
+
+    sold = []
+    rejected = []
+    errors = []
+    start_barrier = threading.Barrier(args.threads)
+
+    def buyer():
+        with app.app_context():
+            ok = failed = 0
+            start_barrier.wait()
+            while True:
+                try:
+                    if args.shards:
+                        reserve_sharded(product_id, args.quantity)
+                    else:
+                        reserve(product_id, args.quantity)
+                    db.session.commit()
+                    ok += 1
+                except OutOfStock:
+                    db.session.rollback()
+                    # reserve_sharded already tried every shard; stock only goes down from here
+                    failed += 1
+                    break
+                except Exception as e:
+                    db.session.rollback()
+                    errors.append(repr(e))
+                    break
+            sold.append(ok)
+            rejected.append(failed)
+            db.session.remove()
+
+    threads = [threading.Thread(target=buyer) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        left = available_stock(product_id)
+    units_sold = sum(sold) * args.quantity
+
+    print(f"threads={args.threads} stock={args.stock} shards={args.shards} quantity={args.quantity}")
+    print(f"reservations={sum(sold)} units_sold={units_sold} rejected={sum(rejected)} left={left}")
+    print(f"elapsed={elapsed:.3f}s throughput={sum(sold) / elapsed:.1f} reservations/s")
+    if errors:
+        print(f"errors={len(errors)} first={errors[0]}")
+
+    oversold = units_sold + left != args.stock or left < 0
+    if oversold or errors:
+        print("FAIL: stock accounting does not add up" if oversold else "FAIL: errors during run")
+        sys.exit(1)
+    print("OK: no overselling")
+
+
+if __name__ == '__main__':
+    main()
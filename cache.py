@@ -0,0 +1,126 @@
+# cache.py
+
+import threading
+import time
+from collections import OrderedDict
+
+# Returned by LRUCache.get when a key is absent, so None can be cached as a value
+MISSING = object()
+
+
+class LRUCache:
+    """
+    A thread-safe, bounded LRU cache with an optional per-entry TTL.
+    Keeps hit/miss/eviction counters for reporting.
+    """
+
+    def __init__(self, maxsize, ttl=0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if not expires_at or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else 0
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class CatalogCache:
+    """
+    Versioned cache for catalog reads.
+
+    Single products live in one LRU and list snapshots (featured products and
+    product pages) in another. Every key includes the catalog version, so bumping
+    the version after a catalog write makes all older entries unreachable at once;
+    they then age out of the LRUs.
+    """
+
+    def __init__(self, max_products, max_lists, ttl=0):
+        self.products = LRUCache(max_products, ttl)
+        self.lists = LRUCache(max_lists, ttl)
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def bump(self):
+        """
+        Invalidate everything cached so far. Call after a catalog write commits.
+        """
+        with self._lock:
+            self._version += 1
+        # Old-version list snapshots can never be hit again, free them right away
+        self.lists.clear()
+
+    def get_product(self, product_id, loader):
+        key = (self._version, product_id)
+        value = self.products.get(key)
+        if value is MISSING:
+            value = loader(product_id)
+            self.products.set(key, value)
+        return value
+
+    def evict_product(self, product_id):
+        self.products.delete((self._version, product_id))
+
+    def get_list(self, key, loader):
+        key = (self._version,) + tuple(key)
+        value = self.lists.get(key)
+        if value is MISSING:
+            value = loader()
+            self.lists.set(key, value)
+        return value
+
+    def stats(self):
+        return {
+            'version': self._version,
+            'products': self.products.stats(),
+            'lists': self.lists.stats()
+        }
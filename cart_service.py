@@ -0,0 +1,75 @@
+# cart_service.py
+
+from collections import namedtuple
+from decimal import Decimal, ROUND_HALF_UP
+from models import Product
+from cart_store import current_cart, current_cart_id, get_cart_store
+
+CENTS = Decimal('0.01')
+
+# items: [{'product', 'quantity', 'subtotal'}] in cart order
+# missing: ids of products in the cart that no longer exist
+PricedCart = namedtuple('PricedCart', ['items', 'total', 'missing'])
+
+
+def to_money(value):
+    """
+    Convert a price to a Decimal rounded to cents, matching Numeric(10, 2).
+    """
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value))
+    return value.quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+class CartService:
+    """
+    Prices a cart ({product_id: quantity}) with a single IN (...) query.
+    """
+
+    def price(self, cart):
+        quantities = {}
+        for pid, qty in (cart or {}).items():
+            try:
+                pid, qty = int(pid), int(qty)
+            except (TypeError, ValueError):
+                continue
+            if qty > 0:
+                quantities[pid] = qty
+
+        if not quantities:
+            return PricedCart([], to_money(0), [])
+
+        products = {p.id: p for p in Product.query.filter(Product.id.in_(quantities)).all()}
+
+        items = []
+        total = to_money(0)
+        missing = []
+        for pid, qty in quantities.items():
+            product = products.get(pid)
+            if product is None:
+                missing.append(pid)
+                continue
+            subtotal = to_money(product.price) * qty
+            total += subtotal
+            items.append({
+                'product': product,
+                'quantity': qty,
+                'subtotal': subtotal
+            })
+        return PricedCart(items, total, missing)
+
+
+cart_service = CartService()
+
+
+def priced_current_cart():
+    """
+    Price the current visitor's cart, dropping products that no longer exist.
+    """
+    priced = cart_service.price(current_cart())
+    if priced.missing:
+        store = get_cart_store()
+        cart_id = current_cart_id()
+        for pid in priced.missing:
+            store.remove_line(cart_id, pid)
+    return priced
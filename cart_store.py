@@ -0,0 +1,330 @@
+# cart_store.py
+
+import datetime
+import secrets
+import threading
+import time
+from flask import current_app, session
+from flask_login import current_user
+from extensions import db
+from models import CartLine
+
+# Carts are {str(product_id): quantity} dicts, the same shape the session cookie used to hold
+
+
+class MemoryCartStore:
+    """
+    Per-process cart store for tests and single-process development servers.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._carts = {}
+        self._lock = threading.Lock()
+
+    def _live(self, cart_id):
+        entry = self._carts.get(cart_id)
+        if entry and entry[1] <= time.monotonic():
+            del self._carts[cart_id]
+            return None
+        return entry
+
+    def _touch(self, cart_id):
+        entry = self._live(cart_id)
+        lines = entry[0] if entry else {}
+        self._carts[cart_id] = (lines, time.monotonic() + self.ttl)
+        return lines
+
+    def get(self, cart_id):
+        with self._lock:
+            entry = self._live(cart_id)
+            return dict(entry[0]) if entry else {}
+
+    def incr(self, cart_id, product_id, quantity):
+        with self._lock:
+            lines = self._touch(cart_id)
+            key = str(product_id)
+            lines[key] = lines.get(key, 0) + quantity
+            return lines[key]
+
+    def set_line(self, cart_id, product_id, quantity):
+        with self._lock:
+            lines = self._touch(cart_id)
+            if quantity > 0:
+                lines[str(product_id)] = quantity
+            else:
+                lines.pop(str(product_id), None)
+
+    def remove_line(self, cart_id, product_id):
+        self.set_line(cart_id, product_id, 0)
+
+    def clear(self, cart_id):
+        with self._lock:
+            self._carts.pop(cart_id, None)
+
+    def merge(self, source_id, target_id):
+        with self._lock:
+            entry = self._live(source_id)
+            self._carts.pop(source_id, None)
+            if not entry:
+                return
+            lines = self._touch(target_id)
+            for key, quantity in entry[0].items():
+                lines[key] = lines.get(key, 0) + quantity
+
+
+class DatabaseCartStore:
+    """
+    Stores one cart_line row per (cart, product).
+    Increments are a single INSERT ... ON CONFLICT DO UPDATE, so concurrent
+    add-to-cart requests never lose an update.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+
+    def _expires_at(self):
+        return datetime.datetime.utcnow() + datetime.timedelta(seconds=self.ttl)
+
+    def _insert(self):
+        if db.engine.dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(CartLine.__table__)
+
+    def _touch(self, cart_id, expires_at):
+        CartLine.query.filter_by(cart_id=cart_id).update(
+            {'expires_at': expires_at}, synchronize_session=False)
+
+    def _drop_expired(self, cart_id):
+        # Lines share one expiry, so this drops an expired cart as a whole, as
+        # the other stores do, before a write could extend it or add onto it
+        CartLine.query.filter(CartLine.cart_id == cart_id,
+                              CartLine.expires_at <= datetime.datetime.utcnow()).delete(synchronize_session=False)
+
+    def get(self, cart_id):
+        now = datetime.datetime.utcnow()
+        rows = (db.session.query(CartLine.product_id, CartLine.quantity)
+                .filter(CartLine.cart_id == cart_id, CartLine.expires_at > now)
+                .all())
+        return {str(product_id): quantity for product_id, quantity in rows}
+
+    def incr(self, cart_id, product_id, quantity):
+        self._drop_expired(cart_id)
+        expires_at = self._expires_at()
+        stmt = self._insert().values(cart_id=cart_id, product_id=product_id,
+                                     quantity=quantity, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['cart_id', 'product_id'],
+            set_={'quantity': CartLine.__table__.c.quantity + stmt.excluded.quantity,
+                  'expires_at': stmt.excluded.expires_at}
+        )
+        db.session.execute(stmt)
+        self._touch(cart_id, expires_at)
+        db.session.commit()
+
+    def set_line(self, cart_id, product_id, quantity):
+        if quantity <= 0:
+            return self.remove_line(cart_id, product_id)
+        self._drop_expired(cart_id)
+        expires_at = self._expires_at()
+        stmt = self._insert().values(cart_id=cart_id, product_id=product_id,
+                                     quantity=quantity, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['cart_id', 'product_id'],
+            set_={'quantity': stmt.excluded.quantity, 'expires_at': stmt.excluded.expires_at}
+        )
+        db.session.execute(stmt)
+        self._touch(cart_id, expires_at)
+        db.session.commit()
+
+    def remove_line(self, cart_id, product_id):
+        CartLine.query.filter_by(cart_id=cart_id, product_id=product_id).delete(synchronize_session=False)
+        db.session.commit()
+
+    def clear(self, cart_id):
+        CartLine.query.filter_by(cart_id=cart_id).delete(synchronize_session=False)
+        db.session.commit()
+
+    def merge(self, source_id, target_id):
+        lines = self.get(source_id)
+        CartLine.query.filter_by(cart_id=source_id).delete(synchronize_session=False)
+        for key, quantity in lines.items():
+            self.incr(target_id, int(key), quantity)
+        db.session.commit()
+
+    def purge_expired(self):
+        """
+        Delete expired lines. Returns the number of rows removed.
+        """
+        deleted = (CartLine.query
+                   .filter(CartLine.expires_at <= datetime.datetime.utcnow())
+                   .delete(synchronize_session=False))
+        db.session.commit()
+        return deleted
+
+
+class LocalRedis:
+    """
+    Minimal in-process stand-in for the subset of the Redis API used by
+    RedisCartStore and RedisRateLimiter. Values come back as bytes, like redis-py.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        expires_at = self._expiry.get(key)
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return self._data.get(key)
+
+    def _hash(self, key, create=False):
+        if self._live(key) is None and create:
+            self._data[key] = {}
+        return self._data.get(key, {})
+
+    def get(self, key):
+        with self._lock:
+            value = self._live(key)
+            return None if value is None else str(value).encode()
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            self._data[key] = int(self._live(key) or 0) + amount
+            return self._data[key]
+
+    def hgetall(self, key):
+        with self._lock:
+            return {k.encode(): str(v).encode() for k, v in self._hash(key).items()}
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            h = self._hash(key, create=True)
+            h[str(field)] = int(h.get(str(field), 0)) + amount
+            return h[str(field)]
+
+    def hset(self, key, field, value):
+        with self._lock:
+            self._hash(key, create=True)[str(field)] = int(value)
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            h = self._hash(key)
+            for field in fields:
+                h.pop(str(field), None)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+                self._expiry.pop(key, None)
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if key in self._data:
+                self._expiry[key] = time.monotonic() + seconds
+
+
+class RedisCartStore:
+    """
+    Stores each cart as a Redis hash of product_id -> quantity.
+    HINCRBY makes increments atomic and the key's TTL handles expiry.
+    """
+
+    def __init__(self, client, ttl, prefix='cart:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, cart_id):
+        return self.prefix + cart_id
+
+    def get(self, cart_id):
+        return {k.decode(): int(v) for k, v in self.client.hgetall(self._key(cart_id)).items()}
+
+    def incr(self, cart_id, product_id, quantity):
+        key = self._key(cart_id)
+        result = self.client.hincrby(key, str(product_id), quantity)
+        self.client.expire(key, self.ttl)
+        return result
+
+    def set_line(self, cart_id, product_id, quantity):
+        if quantity <= 0:
+            return self.remove_line(cart_id, product_id)
+        key = self._key(cart_id)
+        self.client.hset(key, str(product_id), quantity)
+        self.client.expire(key, self.ttl)
+
+    def remove_line(self, cart_id, product_id):
+        self.client.hdel(self._key(cart_id), str(product_id))
+
+    def clear(self, cart_id):
+        self.client.delete(self._key(cart_id))
+
+    def merge(self, source_id, target_id):
+        for key, quantity in self.get(source_id).items():
+            self.incr(target_id, key, quantity)
+        self.clear(source_id)
+
+
+def create_cart_store(config):
+    """
+    Build the cart store selected by CART_STORE_BACKEND.
+    """
+    backend = config.get('CART_STORE_BACKEND', 'database')
+    ttl = config.get('CART_TTL', 30 * 24 * 3600)
+    if backend == 'database':
+        return DatabaseCartStore(ttl)
+    if backend == 'memory':
+        return MemoryCartStore(ttl)
+    if backend == 'redis':
+        import redis
+        return RedisCartStore(redis.Redis.from_url(config['REDIS_URL']), ttl)
+    if backend == 'local-redis':
+        return RedisCartStore(LocalRedis(), ttl)
+    raise ValueError(f'Unknown cart store backend: {backend}')
+
+
+def get_cart_store():
+    return current_app.extensions['cart_store']
+
+
+def current_cart_id():
+    """
+    Logged in users own the cart 'user:<id>'. Anonymous visitors get a random
+    cart id; the session cookie only ever holds that id.
+    """
+    if current_user.is_authenticated:
+        return f'user:{current_user.id}'
+    cart_id = session.get('cart_id')
+    if not cart_id:
+        cart_id = session['cart_id'] = secrets.token_urlsafe(16)
+    return cart_id
+
+
+def merge_anonymous_cart(user_id):
+    """
+    Fold the anonymous cart into the user's cart. Call right after login_user().
+    """
+    cart_id = session.pop('cart_id', None)
+    if cart_id:
+        get_cart_store().merge(cart_id, f'user:{user_id}')
+
+
+def current_cart():
+    """
+    Return the current visitor's cart, moving any cart still held in the
+    session cookie by older versions of the app into the store first.
+    """
+    store = get_cart_store()
+    cart_id = current_cart_id()
+    legacy = session.pop('cart', None)
+    if legacy:
+        for key, quantity in legacy.items():
+            store.incr(cart_id, int(key), int(quantity))
+    return store.get(cart_id)
@@ -0,0 +1,120 @@
+# catalog.py
+
+from decimal import Decimal, InvalidOperation
+from extensions import db
+from models import Product
+from cache import CatalogCache
+from invalidation import invalidation_bus
+from database import run_read
+from config import CATALOG_CACHE_MAX_PRODUCTS, CATALOG_CACHE_MAX_LISTS, CATALOG_CACHE_TTL
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page, parse_sort
+
+# Sortable product fields and how to turn a cursor value back into a column value
+SORT_FIELDS = {
+    'id': (Product.id, int),
+    'price': (Product.price, Decimal),
+    'name': (Product.name, str),
+}
+
+catalog_cache = CatalogCache(CATALOG_CACHE_MAX_PRODUCTS, CATALOG_CACHE_MAX_LISTS, CATALOG_CACHE_TTL)
+
+
+def product_to_dict(product):
+    """
+    Serialize a Product for the API.
+    Prices are Numeric(10, 2) and are sent as strings to keep them exact.
+    """
+    return {
+        'id': product.id,
+        'sku': product.sku,
+        'name': product.name,
+        'description': product.description,
+        'price': str(product.price),
+        'image_url': product.image_url,
+        'updated_at': product.updated_at.isoformat()
+    }
+
+
+def invalidate_catalog(product_id=None):
+    """
+    Drop cached catalog reads in every worker.
+    Call after a product write has been committed.
+    """
+    events = ['catalog']
+    if product_id is not None:
+        events.insert(0, f'product:{product_id}')
+    invalidation_bus.publish(*events)
+
+
+@invalidation_bus.subscribe
+def _on_invalidation(event):
+    if event == 'catalog':
+        catalog_cache.bump()
+    elif event.startswith('product:'):
+        catalog_cache.evict_product(int(event.split(':', 1)[1]))
+
+
+def get_product(product_id):
+    """
+    Return a product as a dict, or None if it does not exist.
+    """
+    return catalog_cache.get_product(product_id, _load_product)
+
+
+def _load_product(product_id):
+    product = run_read(lambda session: session.query(Product).get(product_id))
+    return product_to_dict(product) if product else None
+
+
+def catalog_stamp():
+    """
+    Return (max(updated_at), count) over all products.
+    Changes whenever a product is created, updated or deleted, so it serves
+    as a cheap aggregate validator for list responses.
+    """
+    return catalog_cache.get_list(('stamp',), lambda: tuple(run_read(
+        lambda session: session.query(db.func.max(Product.updated_at), db.func.count(Product.id)).one()
+    )))
+
+
+def featured_products(limit):
+    """
+    Return the first `limit` products for the home page.
+    """
+    return catalog_cache.get_list(('featured', limit), lambda: [
+        product_to_dict(p) for p in run_read(
+            lambda session: session.query(Product).order_by(Product.id).limit(limit).all())
+    ])
+
+
+def product_page(sort='id', after=None, limit=20):
+    """
+    Return one keyset-paginated page of products as dicts.
+
+    `sort` is one of SORT_FIELDS, optionally prefixed with '-' for descending order.
+    `after` is an opaque cursor from a previous page.
+    Returns (products, next_cursor); next_cursor is None on the last page.
+    Raises ValueError (or InvalidCursor) for a bad sort or cursor.
+    """
+    field, descending = parse_sort(sort, SORT_FIELDS)
+    column, convert = SORT_FIELDS[field]
+    sort_key = ('-' if descending else '') + field
+
+    decoded = None
+    if after:
+        sort_value, last_id = decode_cursor(after, sort_key)
+        try:
+            decoded = (convert(sort_value), last_id)
+        except (ValueError, InvalidOperation):
+            raise InvalidCursor('Invalid cursor')
+
+    def load():
+        products, has_more = run_read(lambda session: keyset_page(
+            session.query(Product), column, Product.id, after=decoded, descending=descending, limit=limit))
+        next_cursor = None
+        if has_more and products:
+            last = products[-1]
+            next_cursor = encode_cursor(sort_key, getattr(last, field), last.id)
+        return [product_to_dict(p) for p in products], next_cursor
+
+    return catalog_cache.get_list(('page', sort_key, after or '', limit), load)
@@ -0,0 +1,152 @@
+# commands.py
+
+import csv
+import json
+import sys
+import time
+import click
+from flask.cli import AppGroup, with_appcontext
+
+# `flask <command>` maintenance commands. They import what they need when they
+# run, so listing them or running a different one stays cheap.
+
+
+def register_commands(app):
+    app.cli.add_command(sweep_reservations_command)
+    app.cli.add_command(purge_carts_command)
+    app.cli.add_command(purge_tokens_command)
+    app.cli.add_command(profile_header_command)
+    app.cli.add_command(users_cli)
+
+
+@click.command('sweep-reservations')
+@with_appcontext
+def sweep_reservations_command():
+    """Give back stock held by expired, unconfirmed reservations."""
+    from inventory import sweep_expired
+    print(f"Released {sweep_expired()} expired reservations.")
+
+
+@click.command('purge-carts')
+@with_appcontext
+def purge_carts_command():
+    """Delete expired cart lines from the database cart store."""
+    from flask import current_app
+    from cart_store import DatabaseCartStore
+    store = DatabaseCartStore(current_app.config.get('CART_TTL', 30 * 24 * 3600))
+    print(f"Deleted {store.purge_expired()} expired cart lines.")
+
+
+@click.command('purge-tokens')
+@with_appcontext
+def purge_tokens_command():
+    """Delete expired refresh tokens and access token revocations."""
+    from auth_tokens import purge_expired_tokens
+    print(f"Deleted {purge_expired_tokens()} expired token rows.")
+
+
+@click.command('profile-header')
+@with_appcontext
+@click.argument('path')
+@click.option('--ttl', default=300, help='Seconds the header stays valid.')
+def profile_header_command(path, ttl):
+    """Print a signed X-Profile header that profiles one request to PATH."""
+    from flask import current_app
+    from profiling import sign_header
+    print(f"X-Profile: {sign_header(current_app.config.get('PROFILE_SIGNING_KEY'), path, ttl)}")
+
+
+# Bulk user administration: keys (emails or numeric ids, one per line) come
+# from a file or stdin, results go to stdout as CSV or JSON and the summary to
+# stderr, so the output can be piped into the next command.
+#
+#   flask users show emails.txt --format json
+#   cut -d, -f1 export.csv | flask users set-role admin --dry-run
+
+users_cli = AppGroup('users', help='Look up users and change roles in bulk.')
+
+USER_FIELDS = ('key', 'id', 'email', 'first_name', 'last_name', 'role', 'status')
+ROLE_FIELDS = ('key', 'id', 'email', 'old_role', 'new_role', 'status')
+
+
+def _read_keys(source):
+    return [line.strip() for line in source if line.strip() and not line.startswith('#')]
+
+
+class _Output:
+    """
+    Streams result dicts to stdout as CSV (with a header) or as a JSON array.
+    """
+
+    def __init__(self, fmt, fields):
+        self.fmt = fmt
+        self.fields = fields
+        self.count = 0
+        if fmt == 'csv':
+            self.writer = csv.DictWriter(sys.stdout, fieldnames=fields, extrasaction='ignore')
+            self.writer.writeheader()
+        else:
+            sys.stdout.write('[')
+
+    def write(self, row):
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            sys.stdout.write((',\n' if self.count else '\n') + json.dumps({f: row.get(f) for f in self.fields}))
+        self.count += 1
+
+    def close(self):
+        if self.fmt == 'json':
+            sys.stdout.write('\n]\n')
+        sys.stdout.flush()
+
+
+def _summary(counts, total, started):
+    seconds = time.perf_counter() - started
+    details = ', '.join(f'{count:,} {status}' for status, count in sorted(counts.items()))
+    click.echo(f"{total:,} keys in {seconds:.2f}s ({total / seconds if seconds else 0:,.0f} keys/s): {details}",
+               err=True)
+
+
+@users_cli.command('show')
+@click.argument('source', type=click.File('r'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default='csv')
+@click.option('--chunk-size', default=500, help='Keys per IN query.')
+def show_users_command(source, fmt, chunk_size):
+    """Print the users listed in SOURCE (default: stdin)."""
+    from models import User
+    from users import lookup_users
+
+    keys = _read_keys(source)
+    started = time.perf_counter()
+    counts = {}
+    output = _Output(fmt, USER_FIELDS)
+    columns = (User.id, User.email, User.first_name, User.last_name, User.role)
+    for chunk in lookup_users(keys, *columns, chunk_size=chunk_size):
+        for key, row in chunk:
+            result = dict(row._asdict(), key=key, status='found') if row else {'key': key, 'status': 'not_found'}
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            output.write(result)
+    output.close()
+    _summary(counts, len(keys), started)
+
+
+@users_cli.command('set-role')
+@click.argument('role', type=click.Choice(('user', 'admin')))
+@click.argument('source', type=click.File('r'), default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), default='csv')
+@click.option('--chunk-size', default=500, help='Keys per IN query and UPDATE.')
+@click.option('--dry-run', is_flag=True, help='Report what would change without writing.')
+def set_role_command(role, source, fmt, chunk_size, dry_run):
+    """Give ROLE to every user listed in SOURCE (default: stdin)."""
+    from users import set_users_role
+
+    keys = _read_keys(source)
+    started = time.perf_counter()
+    counts = {}
+    output = _Output(fmt, ROLE_FIELDS)
+    for result in set_users_role(keys, role, chunk_size=chunk_size, dry_run=dry_run):
+        counts[result['status']] = counts.get(result['status'], 0) + 1
+        output.write(result)
+    output.close()
+    _summary(counts, len(keys), started)
@@ -14,8 +14,91 @@ POSTGRES_DB = os.getenv('POSTGRES_DB', 'antiradicalshield_db')
 POSTGRES_HOST = os.getenv('POSTGRES_HOST', 'localhost')
 POSTGRES_PORT = os.getenv('POSTGRES_PORT', '5432')
 
-SQLALCHEMY_DATABASE_URI = (
+# DATABASE_URL overrides the PostgreSQL settings above (e.g. sqlite:///bench.sqlite3 for benchmarks)
+SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL') or (
     f'postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}'
 )
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+# Connection pool (see database.engine_options)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0'))  # PostgreSQL only, 0 = no limit
+
+# Optional read replica for catalog reads
+REPLICA_DATABASE_URI = os.getenv('REPLICA_DATABASE_URL')
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))  # seconds reads stay on the primary after a write
+REPLICA_RETRY_INTERVAL = float(os.getenv('REPLICA_RETRY_INTERVAL', '30'))  # seconds to skip a failed replica
 SECRET_KEY = os.getenv('SECRET_KEY', '123456')  # Replace with a strong key
+
+# Catalog pagination
+PRODUCTS_PER_PAGE = int(os.getenv('PRODUCTS_PER_PAGE', '12'))
+FEATURED_PRODUCTS_LIMIT = int(os.getenv('FEATURED_PRODUCTS_LIMIT', '4'))
+API_DEFAULT_PAGE_SIZE = int(os.getenv('API_DEFAULT_PAGE_SIZE', '20'))
+API_MAX_PAGE_SIZE = int(os.getenv('API_MAX_PAGE_SIZE', '100'))
+
+# Catalog cache
+CATALOG_CACHE_MAX_PRODUCTS = int(os.getenv('CATALOG_CACHE_MAX_PRODUCTS', '10000'))
+CATALOG_CACHE_MAX_LISTS = int(os.getenv('CATALOG_CACHE_MAX_LISTS', '1000'))
+CATALOG_CACHE_TTL = float(os.getenv('CATALOG_CACHE_TTL', '300'))  # seconds, 0 disables expiry
+
+# Cache invalidation between workers: 'postgres' (LISTEN/NOTIFY), 'memory' (single process)
+# or 'auto' to use PostgreSQL whenever the database is PostgreSQL
+CACHE_INVALIDATION_BACKEND = os.getenv('CACHE_INVALIDATION_BACKEND', 'auto')
+CACHE_INVALIDATION_CHANNEL = os.getenv('CACHE_INVALIDATION_CHANNEL', 'cache_invalidation')
+
+# Server-side cart storage: 'database', 'redis' or 'memory' (single process, tests)
+CART_STORE_BACKEND = os.getenv('CART_STORE_BACKEND', 'database')
+CART_TTL = int(os.getenv('CART_TTL', str(30 * 24 * 3600)))  # seconds since the last change
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+
+# Password hashing: bcrypt runs in a bounded pool of worker processes
+BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))  # Raising it rehashes passwords on next login
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))  # 0 = inline
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '64'))  # queued + running
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', '2'))  # seconds to wait for a slot
+PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))  # seconds to wait for the result
+
+# current_user for HTML requests comes from a per-process identity cache
+IDENTITY_CACHE_SIZE = int(os.getenv('IDENTITY_CACHE_SIZE', '10000'))
+IDENTITY_CACHE_TTL = int(os.getenv('IDENTITY_CACHE_TTL', '60'))  # seconds; bounds staleness if an invalidation is missed
+
+# API authentication
+JWT_CACHE_SIZE = int(os.getenv('JWT_CACHE_SIZE', '10000'))  # verified tokens kept per process, 0 = off
+ACCESS_TOKEN_TTL = int(os.getenv('ACCESS_TOKEN_TTL', '900'))  # seconds
+REFRESH_TOKEN_TTL = int(os.getenv('REFRESH_TOKEN_TTL', str(30 * 24 * 3600)))  # seconds
+REVOCATION_SYNC_INTERVAL = int(os.getenv('REVOCATION_SYNC_INTERVAL', '60'))  # seconds between reloads of revoked tokens
+JWT_USER_SNAPSHOT = os.getenv('JWT_USER_SNAPSHOT', 'false').lower() in ('1', 'true', 'yes')  # embed the profile in tokens, used while it matches the cached identity
+
+# Throttling: auth rate limits (requests/seconds) and load shedding
+RATELIMIT_BACKEND = os.getenv('RATELIMIT_BACKEND', 'memory')  # 'memory', 'redis', 'local-redis' or 'off'
+RATELIMIT_AUTH_PER_IP = os.getenv('RATELIMIT_AUTH_PER_IP', '30/60')
+RATELIMIT_AUTH_PER_EMAIL = os.getenv('RATELIMIT_AUTH_PER_EMAIL', '10/300')
+MAX_CONCURRENT_REQUESTS = int(os.getenv('MAX_CONCURRENT_REQUESTS', '64'))
+MAX_CONCURRENT_AUTH_REQUESTS = int(os.getenv('MAX_CONCURRENT_AUTH_REQUESTS', '8'))  # login/register, mostly bcrypt
+LOAD_SHED_MAX_WAIT = float(os.getenv('LOAD_SHED_MAX_WAIT', '0.5'))  # seconds to wait for a slot before a 503
+
+# SQL instrumentation: per-request query counts, N+1 warnings, Server-Timing
+SQL_INSTRUMENTATION = os.getenv('SQL_INSTRUMENTATION', 'false').lower() in ('1', 'true', 'yes')
+SQL_SLOW_QUERY_MS = float(os.getenv('SQL_SLOW_QUERY_MS', '200'))
+SQL_N_PLUS_ONE_THRESHOLD = int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', '5'))  # runs of one statement per request
+SQL_QUERY_BUDGET_STRICT = os.getenv('SQL_QUERY_BUDGET_STRICT', 'false').lower() in ('1', 'true', 'yes')  # raise, for tests
+
+# /metrics (Prometheus text format)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # If set, scrapes must send 'Authorization: Bearer <token>'
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR')  # Shared directory for pre-fork servers
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))  # seconds between per-worker file writes
+
+# On-demand request profiling (see profiling.RequestProfiler)
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+PROFILE_MAX_BYTES = int(os.getenv('PROFILE_MAX_BYTES', str(100 * 1024 * 1024)))  # oldest files are deleted beyond this
+PROFILE_STACK_INTERVAL = float(os.getenv('PROFILE_STACK_INTERVAL', '0.005'))  # seconds between stack samples
+PROFILE_SIGNING_KEY = os.getenv('PROFILE_SIGNING_KEY')  # Enables the signed X-Profile header
+
+# Bulk product import (POST /api/products/bulk) and export (GET /api/products/export)
+PRODUCT_BULK_CHUNK_SIZE = int(os.getenv('PRODUCT_BULK_CHUNK_SIZE', '1000'))  # rows per upsert and commit, at most 1000
+PRODUCT_BULK_MAX_ERRORS = int(os.getenv('PRODUCT_BULK_MAX_ERRORS', '1000'))  # rejected rows listed in the report
+PRODUCT_EXPORT_BATCH_SIZE = int(os.getenv('PRODUCT_EXPORT_BATCH_SIZE', '1000'))  # rows fetched and written at a time
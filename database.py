@@ -0,0 +1,193 @@
+# database.py
+
+import logging
+import threading
+import time
+from functools import wraps
+from flask import g, has_request_context, request, session
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import QueuePool
+from extensions import db
+from invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long callers wait to check out a connection.
+    Long waits mean the pool is too small for the worker's concurrency.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._wait_lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._wait_lock:
+                self.checkout_timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._wait_lock:
+                self.checkouts += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def engine_options(uri, config):
+    """
+    SQLAlchemy create_engine() options for `uri` from the DB_* settings.
+    In-memory SQLite keeps Flask-SQLAlchemy's single shared connection.
+    """
+    url = make_url(uri)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return {}
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT_MS', 0)
+    if url.get_backend_name() == 'sqlite':
+        options['connect_args'] = {'check_same_thread': False}
+    elif url.get_backend_name() == 'postgresql' and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={int(statement_timeout)}'}
+    return options
+
+
+def pool_stats(engine):
+    """
+    Size, usage and checkout wait figures for an engine's pool.
+    """
+    pool = engine.pool
+    stats = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    if isinstance(pool, TimedQueuePool):
+        with pool._wait_lock:
+            stats.update(
+                checkouts=pool.checkouts,
+                checkout_timeouts=pool.checkout_timeouts,
+                wait_seconds_total=round(pool.wait_seconds_total, 6),
+                wait_seconds_avg=round(pool.wait_seconds_total / pool.checkouts, 6) if pool.checkouts else 0.0,
+                wait_seconds_max=round(pool.wait_seconds_max, 6),
+            )
+    return stats
+
+
+class ReadRouter:
+    """
+    Sends catalog reads to a read replica when REPLICA_DATABASE_URI is set.
+
+    Reads fall back to the primary
+      - when the current view is not marked with @replica_reads,
+      - for REPLICA_MAX_LAG seconds after any catalog write (in any worker,
+        via the invalidation bus), so caches are never refilled from a replica
+        that has not caught up yet,
+      - for REPLICA_MAX_LAG seconds after the visitor's own write (read-your-writes),
+      - for REPLICA_RETRY_INTERVAL seconds after the replica failed.
+    """
+
+    def __init__(self):
+        self.engine = None
+        self.session = None
+        self.max_lag = 5
+        self.retry_interval = 30
+        self._primary_until = 0.0
+        self._down_until = 0.0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.failures = 0
+
+    def init_app(self, app):
+        uri = app.config.get('REPLICA_DATABASE_URI')
+        self.max_lag = app.config.get('REPLICA_MAX_LAG', 5)
+        self.retry_interval = app.config.get('REPLICA_RETRY_INTERVAL', 30)
+        if not uri:
+            return
+        self.engine = create_engine(uri, **engine_options(uri, app.config))
+        # binds={} or Flask-SQLAlchemy maps every table back to the primary engine
+        self.session = db.create_scoped_session({'bind': self.engine, 'binds': {}})
+        app.teardown_appcontext(lambda exc: self.session.remove())
+        app.after_request(self._remember_write)
+
+    def _remember_write(self, response):
+        # Only visitors who already have a session cookie can be tracked
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 and session:
+            session['read_primary_until'] = time.time() + self.max_lag
+        return response
+
+    def _use_replica(self):
+        if self.session is None or not has_request_context() or not g.get('replica_reads'):
+            return False
+        now = time.monotonic()
+        if now < self._primary_until or now < self._down_until:
+            return False
+        return session.get('read_primary_until', 0) < time.time()
+
+    def mark_written(self):
+        self._primary_until = time.monotonic() + self.max_lag
+
+    def run(self, load):
+        """
+        Return load(session), run on the replica session when routed there
+        and on db.session otherwise or if the replica fails.
+        """
+        if self._use_replica():
+            try:
+                result = load(self.session)
+                self.replica_reads += 1
+                return result
+            except DBAPIError as e:
+                logger.warning("Replica read failed, using the primary: %s", e.orig)
+                self.session.rollback()
+                self.failures += 1
+                self._down_until = time.monotonic() + self.retry_interval
+        self.primary_reads += 1
+        return load(db.session)
+
+    def stats(self):
+        stats = {'primary': pool_stats(db.engine),
+                 'reads': {'replica': self.replica_reads, 'primary': self.primary_reads,
+                           'replica_failures': self.failures}}
+        if self.engine is not None:
+            stats['replica'] = pool_stats(self.engine)
+        return stats
+
+
+read_router = ReadRouter()
+
+
+@invalidation_bus.subscribe
+def _on_invalidation(event):
+    if event == 'catalog':
+        read_router.mark_written()
+
+
+def run_read(load):
+    return read_router.run(load)
+
+
+def replica_reads(f):
+    """
+    Decorator for read-only views whose catalog reads may use the replica.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        g.replica_reads = True
+        return f(*args, **kwargs)
+    return decorated
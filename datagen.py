@@ -0,0 +1,228 @@
+# datagen.py
+
+import csv
+import datetime
+import io
+import random
+import sys
+import time
+from extensions import db
+
+# Synthetic data for local load testing. Everything derives from the seed, so
+# the same arguments always produce the same rows. Rows are written in chunks
+# straight through the DBAPI connection: COPY on PostgreSQL, executemany on
+# SQLite. Ids are assigned here, so orders can reference users and products
+# without reading anything back.
+
+BASE_TIME = datetime.datetime(2024, 1, 1)
+FIRST_NAMES = ('Noa', 'Ariel', 'Maya', 'Daniel', 'Yael', 'Omer', 'Tamar', 'Itai', 'Shira', 'Eitan')
+LAST_NAMES = ('Cohen', 'Levi', 'Mizrahi', 'Peretz', 'Biton', 'Dahan', 'Avraham', 'Friedman', 'Katz', 'Azulay')
+CITIES = ('Tel Aviv', 'Jerusalem', 'Haifa', 'Beersheba', 'Eilat', 'Netanya', 'Ashdod', 'Rehovot')
+PRODUCT_WORDS = ('Serum', 'Cream', 'Toner', 'Mask', 'Essence', 'Lotion', 'Cleanser', 'Gel', 'Balm', 'Oil')
+PRODUCT_ADJECTIVES = ('Radiance', 'Renewal', 'Collagen', 'Peptide', 'Hydrating', 'Firming', 'Detox', 'Vitamin C')
+ORDER_STATUSES = ('Pending', 'Shipped', 'Delivered', 'Delivered', 'Delivered')
+
+
+def product_price(product_id):
+    """
+    Price of a generated product, computed from its id so order items can
+    price themselves without keeping a million prices in memory.
+    """
+    return (product_id * 7919 % 9000 + 999) / 100
+
+
+def _timestamp(rng, days=365):
+    return (BASE_TIME + datetime.timedelta(seconds=rng.randrange(days * 86400))).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class Progress:
+    """
+    One self-overwriting status line per table on stderr, then a rows/sec summary.
+    """
+
+    def __init__(self, label, total):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.perf_counter()
+        self._shown = 0.0
+
+    def update(self, rows):
+        self.done += rows
+        now = time.perf_counter()
+        if now - self._shown >= 0.5 or self.done >= self.total:
+            self._shown = now
+            rate = self.done / max(now - self.started, 1e-9)
+            sys.stderr.write(f'\r{self.label:12s} {self.done:>12,}/{self.total:,} '
+                             f'({self.done / max(self.total, 1):4.0%}) {rate:>10,.0f} rows/s')
+            sys.stderr.flush()
+
+    def finish(self):
+        seconds = time.perf_counter() - self.started
+        sys.stderr.write('\n')
+        return {'table': self.label, 'rows': self.done, 'seconds': round(seconds, 2),
+                'rows_per_second': round(self.done / seconds) if seconds else 0}
+
+
+class BulkWriter:
+    """
+    Appends rows to tables through one raw DBAPI connection, committing per chunk.
+    """
+
+    def __init__(self, engine):
+        self.dialect = engine.dialect.name
+        self.connection = engine.raw_connection()
+        if self.dialect == 'sqlite':
+            # Only affects this connection; a crash mid-load means reloading anyway
+            cursor = self.connection.cursor()
+            cursor.execute('PRAGMA synchronous = OFF')
+            cursor.execute('PRAGMA journal_mode = MEMORY')
+            cursor.close()
+
+    def write(self, table, columns, rows):
+        cursor = self.connection.cursor()
+        try:
+            if self.dialect == 'postgresql':
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                buffer.seek(0)
+                # Empty unquoted fields are NULL in CSV format; strings here are never empty
+                cursor.copy_expert(f'COPY "{table.name}" ({", ".join(columns)}) FROM STDIN WITH (FORMAT csv)', buffer)
+            else:
+                placeholders = ', '.join('?' for _ in columns)
+                cursor.executemany(f'INSERT INTO "{table.name}" ({", ".join(columns)}) VALUES ({placeholders})', rows)
+            self.connection.commit()
+        finally:
+            cursor.close()
+
+    def next_id(self, table):
+        cursor = self.connection.cursor()
+        cursor.execute(f'SELECT MAX(id) FROM "{table.name}"')
+        last = cursor.fetchone()[0]
+        cursor.close()
+        return (last or 0) + 1
+
+    def reset_sequence(self, table):
+        """
+        Move a PostgreSQL serial past the ids written explicitly.
+        """
+        if self.dialect != 'postgresql':
+            return
+        cursor = self.connection.cursor()
+        cursor.execute(f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                       f"(SELECT COALESCE(MAX(id), 1) FROM \"{table.name}\"))")
+        self.connection.commit()
+        cursor.close()
+
+    def close(self):
+        self.connection.close()
+
+
+def generate_users(writer, count, password_hash, rng, chunk_size):
+    table = db.metadata.tables['user']
+    columns = ('id', 'email', 'password', 'first_name', 'last_name', 'display_name', 'date_of_birth',
+               'address_line1', 'address_line2', 'city', 'state', 'zip_code', 'country', 'phone_number',
+               'role', 'updated_at')
+    first_id = writer.next_id(table)
+    progress = Progress('users', count)
+    for start in range(first_id, first_id + count, chunk_size):
+        rows = []
+        for user_id in range(start, min(start + chunk_size, first_id + count)):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            city = rng.choice(CITIES)
+            birth = datetime.date(1950, 1, 1) + datetime.timedelta(days=rng.randrange(20000))
+            rows.append((user_id, f'user{user_id}@example.com', password_hash, first, last,
+                         f'{first}{last[0]}{user_id}', birth.isoformat(), f'{rng.randrange(1, 300)} Main St',
+                         None, city, city, f'{rng.randrange(10000, 99999)}', 'Israel',
+                         f'+972-5{rng.randrange(10)}-{rng.randrange(1000000, 9999999)}', 'user', _timestamp(rng)))
+        writer.write(table, columns, rows)
+        progress.update(len(rows))
+    writer.reset_sequence(table)
+    return progress.finish()
+
+
+def generate_products(writer, count, rng, chunk_size):
+    table = db.metadata.tables['product']
+    columns = ('id', 'name', 'description', 'price', 'image_url', 'stock', 'stock_shards', 'updated_at')
+    first_id = writer.next_id(table)
+    progress = Progress('products', count)
+    for start in range(first_id, first_id + count, chunk_size):
+        rows = []
+        for product_id in range(start, min(start + chunk_size, first_id + count)):
+            name = f'{rng.choice(PRODUCT_ADJECTIVES)} {rng.choice(PRODUCT_WORDS)} {product_id}'
+            rows.append((product_id, name, f'Synthetic {name.lower()} for load testing.',
+                         f'{product_price(product_id):.2f}', f'/static/img/product{product_id % 10 + 1}.jpg',
+                         rng.randrange(0, 500) if rng.random() < 0.5 else None, 0, _timestamp(rng)))
+        writer.write(table, columns, rows)
+        progress.update(len(rows))
+    writer.reset_sequence(table)
+    return progress.finish()
+
+
+def generate_orders(writer, count, users, products, max_items, rng, chunk_size):
+    """
+    Orders go to users 1..users and products 1..products (ids are assumed
+    contiguous, as they are after setup_db.py). Every order gets 1..max_items
+    items and a total that matches them.
+    """
+    order_table = db.metadata.tables['order']
+    item_table = db.metadata.tables['order_item']
+    order_columns = ('id', 'user_id', 'order_date', 'total_amount', 'status')
+    item_columns = ('id', 'order_id', 'product_id', 'quantity', 'price_at_purchase')
+    first_id = writer.next_id(order_table)
+    item_id = writer.next_id(item_table)
+    progress = Progress('orders', count)
+    items_written = 0
+    for start in range(first_id, first_id + count, chunk_size):
+        orders, items = [], []
+        for order_id in range(start, min(start + chunk_size, first_id + count)):
+            total = 0.0
+            for _ in range(rng.randint(1, max_items)):
+                product_id = rng.randint(1, products)
+                quantity = rng.randint(1, 3)
+                price = product_price(product_id)
+                total += price * quantity
+                items.append((item_id, order_id, product_id, quantity, f'{price:.2f}'))
+                item_id += 1
+            orders.append((order_id, rng.randint(1, users), _timestamp(rng),
+                           f'{total:.2f}', rng.choice(ORDER_STATUSES)))
+        writer.write(order_table, order_columns, orders)
+        writer.write(item_table, item_columns, items)
+        items_written += len(items)
+        progress.update(len(orders))
+    writer.reset_sequence(order_table)
+    writer.reset_sequence(item_table)
+    summary = progress.finish()
+    summary['order_items'] = items_written
+    return summary
+
+
+def generate(users=0, products=0, orders=0, seed=1, password='password', max_items=4, chunk_size=20000):
+    """
+    Append synthetic users, products and orders (with their items) to the
+    database of the current app context. Returns per-table row counts and rates.
+
+    All users share one bcrypt hash of `password`, computed once.
+    Orders need at least one user and one product, generated or already present.
+    """
+    from passwords import password_hasher
+
+    writer = BulkWriter(db.engine)
+    summaries = []
+    try:
+        if users:
+            password_hash = password_hasher.generate_password_hash(password)
+            summaries.append(generate_users(writer, users, password_hash, random.Random(f'{seed}:users'),
+                                            chunk_size))
+        if products:
+            summaries.append(generate_products(writer, products, random.Random(f'{seed}:products'), chunk_size))
+        if orders:
+            user_count = writer.next_id(db.metadata.tables['user']) - 1
+            product_count = writer.next_id(db.metadata.tables['product']) - 1
+            if not user_count or not product_count:
+                raise ValueError('Orders need at least one user and one product')
+            summaries.append(generate_orders(writer, orders, user_count, product_count, max_items,
+                                             random.Random(f'{seed}:orders'), chunk_size))
+    finally:
+        writer.close()
+    return summaries
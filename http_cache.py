@@ -0,0 +1,57 @@
+# http_cache.py
+
+import datetime
+import hashlib
+from flask import request, make_response
+
+
+def make_etag(*parts):
+    """
+    Build a strong ETag value from the given parts.
+    """
+    raw = '|'.join(str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    # HTTP dates have one-second resolution
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    True when the client's If-None-Match / If-Modified-Since validators
+    show it already has the current representation.
+    If-None-Match takes precedence and uses the weak comparison, as required
+    by RFC 7232.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since:
+        return _as_utc(last_modified) <= _as_utc(request.if_modified_since)
+    return False
+
+
+def conditional_response(etag, last_modified, build):
+    """
+    Answer with a bodyless 304 when the client is up to date, otherwise call
+    `build()` to produce the full response. Validators are attached to 200 and
+    304 responses so the client can revalidate next time. Pass last_modified
+    None for collections, where no single timestamp covers deletions.
+    `build` may return a response or a (response, status) tuple.
+    """
+    if is_not_modified(etag, last_modified):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,53 @@
+# identity.py
+
+from collections import namedtuple
+from flask_login import UserMixin
+from extensions import db
+from models import User
+from cache import LRUCache, MISSING
+from invalidation import invalidation_bus
+from config import IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL
+
+# Columns current_user needs on ordinary page views; anything else (the profile
+# form, password checks) loads the real User. updated_at tells whether a token's
+# user snapshot is still current.
+IDENTITY_FIELDS = ('id', 'email', 'first_name', 'last_name', 'display_name', 'role', 'updated_at')
+
+identity_cache = LRUCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
+
+
+class Identity(namedtuple('Identity', IDENTITY_FIELDS), UserMixin):
+    """
+    Read-only stand-in for User used as Flask-Login's current_user.
+    """
+    __slots__ = ()
+
+
+def invalidate_user(*user_ids):
+    """
+    Drop the cached identity of one or more users in every worker.
+    Call after a change to the users has been committed.
+    """
+    if user_ids:
+        invalidation_bus.publish(*(f'user:{user_id}' for user_id in user_ids))
+
+
+@invalidation_bus.subscribe
+def _on_invalidation(event):
+    # Events missed while a transport reconnects are covered by the TTL
+    if event.startswith('user:'):
+        identity_cache.delete(int(event.split(':', 1)[1]))
+
+
+def load_identity(user_id):
+    """
+    Return the Identity of a user, or None if there is no such user.
+    Unknown ids are cached too, so a stale session cookie costs one query per TTL.
+    """
+    identity = identity_cache.get(user_id)
+    if identity is MISSING:
+        row = (db.session.query(*(getattr(User, field) for field in IDENTITY_FIELDS))
+               .filter(User.id == user_id).first())
+        identity = Identity(*row) if row else None
+        identity_cache.set(user_id, identity)
+    return identity
@@ -0,0 +1,203 @@
+# invalidation.py
+
+import logging
+import os
+import select
+import threading
+import uuid
+from sqlalchemy import text
+from sqlalchemy.engine.url import make_url
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryTransport:
+    """
+    Delivers events to every bus attached to the same in-process hub.
+    Stand-in for tests and single-process development servers: several
+    InvalidationBus instances on one hub behave like several workers.
+    """
+
+    _hubs = {}
+
+    def __init__(self, bus, hub='default'):
+        self.bus = bus
+        self.peers = MemoryTransport._hubs.setdefault(hub, [])
+
+    def send(self, payloads):
+        for peer in list(self.peers):
+            for payload in payloads:
+                peer.bus._receive(payload)
+
+    def start(self):
+        if self not in self.peers:
+            self.peers.append(self)
+
+    def stop(self):
+        if self in self.peers:
+            self.peers.remove(self)
+
+    def restart(self):
+        self.start()
+
+
+class PostgresTransport:
+    """
+    Fans events out to every worker through PostgreSQL LISTEN/NOTIFY.
+
+    Publishing runs pg_notify on an autocommit connection from the app engine.
+    A daemon thread keeps a dedicated psycopg2 connection LISTENing on the channel
+    and reconnects with a backoff if it drops. Notifications sent while it was
+    disconnected are lost, so every (re)connect is reported as a full 'catalog'
+    invalidation.
+    """
+
+    def __init__(self, bus, engine, channel, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.bus = bus
+        self.engine = engine
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        url = make_url(str(engine.url)).set(drivername='postgresql')
+        self.dsn = url.render_as_string(hide_password=False)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def send(self, payloads):
+        with self.engine.connect() as conn:
+            conn = conn.execution_options(isolation_level='AUTOCOMMIT')
+            for payload in payloads:
+                conn.execute(text('SELECT pg_notify(:channel, :payload)'),
+                             {'channel': self.channel, 'payload': payload})
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._listen, name='cache-invalidation', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def restart(self):
+        """
+        Start a listener in a forked child. The parent's thread did not survive
+        the fork, and its Event may have been copied mid-use.
+        """
+        self._stop = threading.Event()
+        self._thread = None
+        self.start()
+
+    def _listen(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(self.dsn)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                delay = self.reconnect_delay
+                # Anything published while we were not listening is gone
+                self.bus.dispatch('catalog')
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self.bus._receive(conn.notifies.pop(0).payload)
+            except Exception:
+                logger.exception('Cache invalidation listener failed, reconnecting in %.1fs', delay)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+
+class InvalidationBus:
+    """
+    Publishes cache invalidation events such as 'catalog' or 'product:<id>'
+    to every worker, including the publishing one.
+
+    Handlers registered with subscribe() are called with the event string.
+    Events published by this process are dispatched locally right away and
+    skipped when they come back through the transport.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex
+        self._handlers = []
+        self._listening = False
+        self.transport = MemoryTransport(self)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        # Pre-fork servers (gunicorn --preload) fork after create_app: every
+        # worker needs its own origin, or it drops its siblings' events as its
+        # own, and its own listener thread, since threads do not survive a fork
+        self.origin = uuid.uuid4().hex
+        if self._listening:
+            self.transport.restart()
+
+    def init_app(self, app, engine=None, listen=True):
+        """
+        listen=False only publishes, for short-lived processes such as CLI commands.
+        """
+        backend = app.config.get('CACHE_INVALIDATION_BACKEND', 'auto')
+        uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+        if backend == 'auto':
+            backend = 'postgres' if uri.startswith('postgresql') else 'memory'
+
+        self.transport.stop()
+        if backend == 'postgres':
+            if engine is None:
+                from extensions import db
+                with app.app_context():
+                    engine = db.engine
+            channel = app.config.get('CACHE_INVALIDATION_CHANNEL', 'cache_invalidation')
+            self.transport = PostgresTransport(self, engine, channel)
+        elif backend == 'memory':
+            self.transport = MemoryTransport(self)
+        else:
+            raise ValueError(f'Unknown cache invalidation backend: {backend}')
+        self._listening = listen
+        if listen:
+            self.transport.start()
+
+    def subscribe(self, handler):
+        self._handlers.append(handler)
+        return handler
+
+    def publish(self, *events):
+        """
+        Invalidate `events` locally and on every other worker.
+        Call only after the write that caused them has been committed.
+        """
+        for event in events:
+            self.dispatch(event)
+        try:
+            self.transport.send([f'{self.origin}|{event}' for event in events])
+        except Exception:
+            # Other workers catch up when their cache TTL expires
+            logger.exception('Failed to publish cache invalidation events %s', events)
+
+    def dispatch(self, event):
+        for handler in self._handlers:
+            try:
+                handler(event)
+            except Exception:
+                logger.exception('Cache invalidation handler failed for %s', event)
+
+    def _receive(self, payload):
+        origin, _, event = payload.partition('|')
+        if origin != self.origin:
+            self.dispatch(event)
+
+
+invalidation_bus = InvalidationBus()
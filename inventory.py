@@ -0,0 +1,220 @@
+# inventory.py
+
+import datetime
+import random
+from sqlalchemy import update, or_
+from extensions import db
+from models import Product, StockShard, StockReservation
+
+# Every stock change here is a single conditional UPDATE: the row is only
+# touched when enough stock is left, so concurrent checkouts can never take
+# more than there is, and nothing is read and written back in Python.
+# updated_at is pinned because stock is not part of the catalog representation.
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_ids):
+        super().__init__(f'Insufficient stock for products {sorted(product_ids)}')
+        self.product_ids = product_ids
+
+
+def _supports_returning():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def reserve(product_id, quantity):
+    """
+    Take `quantity` units of an unsharded product in the current transaction.
+    Returns the remaining stock (None when stock is not tracked, or when the
+    database cannot report it) and raises OutOfStock if there is not enough.
+    """
+    stmt = (update(Product)
+            .where(Product.id == product_id,
+                   Product.stock_shards == 0,
+                   or_(Product.stock.is_(None), Product.stock >= quantity))
+            .values(stock=Product.stock - quantity, updated_at=Product.updated_at))
+    if _supports_returning():
+        row = db.session.execute(stmt.returning(Product.stock)).first()
+        if row is None:
+            raise OutOfStock([product_id])
+        return row[0]
+    if db.session.execute(stmt).rowcount != 1:
+        raise OutOfStock([product_id])
+    return None
+
+
+def reserve_sharded(product_id, quantity):
+    """
+    Take `quantity` units from one shard of a sharded product, starting at a
+    random shard so concurrent buyers spread over different rows.
+    Returns the shard used; raises OutOfStock if no single shard has enough.
+    """
+    product = Product.query.get(product_id)
+    shards = product.stock_shards if product else 0
+    start = random.randrange(shards) if shards else 0
+    for offset in range(shards):
+        shard = (start + offset) % shards
+        result = db.session.execute(
+            update(StockShard)
+            .where(StockShard.product_id == product_id,
+                   StockShard.shard == shard,
+                   StockShard.stock >= quantity)
+            .values(stock=StockShard.stock - quantity)
+        )
+        if result.rowcount == 1:
+            return shard
+    raise OutOfStock([product_id])
+
+
+def reserve_items(priced_items):
+    """
+    Take stock for every line of a priced cart in the current transaction.
+
+    Unsharded products are handled by one UPDATE ... SET stock = stock - CASE ...
+    covering all lines; it must match every line or nothing is taken. Sharded
+    products fall back to reserve_sharded per line. The caller commits on
+    success. On OutOfStock the transaction has already been rolled back, so
+    the short products can be reported from the stock as it was.
+    """
+    plain = {}
+    for item in priced_items:
+        product = item['product']
+        if product.stock_shards:
+            reserve_sharded(product.id, item['quantity'])
+        else:
+            plain[product.id] = plain.get(product.id, 0) + item['quantity']
+    if not plain:
+        return
+
+    wanted = db.case(plain, value=Product.id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.id.in_(plain),
+               Product.stock_shards == 0,
+               or_(Product.stock.is_(None), Product.stock >= wanted))
+        .values(stock=Product.stock - wanted, updated_at=Product.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != len(plain):
+        # The UPDATE already took stock from the lines that had enough
+        db.session.rollback()
+        short = [pid for pid, stock in db.session.query(Product.id, Product.stock)
+                 .filter(Product.id.in_(plain)).all()
+                 if stock is not None and stock < plain[pid]]
+        raise OutOfStock(short or list(plain))
+
+
+def set_stock(product_id, stock, shards=0):
+    """
+    Set the stock of a product, optionally spread evenly over `shards` rows.
+    `stock` None stops tracking stock for the product.
+    """
+    StockShard.query.filter_by(product_id=product_id).delete(synchronize_session=False)
+    if shards and stock is not None:
+        base, extra = divmod(stock, shards)
+        db.session.add_all([
+            StockShard(product_id=product_id, shard=i, stock=base + (1 if i < extra else 0))
+            for i in range(shards)
+        ])
+        values = {'stock': None, 'stock_shards': shards}
+    else:
+        values = {'stock': stock, 'stock_shards': 0}
+    Product.query.filter_by(id=product_id).update(values, synchronize_session='fetch')
+
+
+def available_stock(product_id):
+    """
+    Return the stock left for a product, summing shards; None if not tracked.
+    """
+    product = Product.query.get(product_id)
+    if product is None:
+        return 0
+    if product.stock_shards:
+        return db.session.query(db.func.coalesce(db.func.sum(StockShard.stock), 0)) \
+            .filter(StockShard.product_id == product_id).scalar()
+    return product.stock
+
+
+def hold(product_id, quantity, ttl):
+    """
+    Reserve stock for `ttl` seconds, e.g. while a flash-sale buyer pays.
+    Commits and returns the StockReservation; raises OutOfStock.
+    Call confirm() when the order is placed; sweep_expired() gives back holds
+    that were never confirmed.
+    """
+    product = Product.query.get(product_id)
+    shard = None
+    try:
+        if product is not None and product.stock_shards:
+            shard = reserve_sharded(product_id, quantity)
+        else:
+            reserve(product_id, quantity)
+        reservation = StockReservation(
+            product_id=product_id, shard=shard, quantity=quantity,
+            expires_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl)
+        )
+        db.session.add(reservation)
+        db.session.commit()
+    except OutOfStock:
+        db.session.rollback()
+        raise
+    return reservation
+
+
+def confirm(reservation_id, order_id):
+    """
+    Attach a hold to an order so the sweeper leaves it alone.
+    Returns False if the hold already expired and was swept.
+    """
+    confirmed = (StockReservation.query
+                 .filter_by(id=reservation_id, order_id=None)
+                 .update({'order_id': order_id}, synchronize_session=False))
+    db.session.commit()
+    return confirmed == 1
+
+
+def release(reservation_id):
+    """
+    Give back the stock of an unconfirmed hold. Returns True if it was released.
+    The conditional DELETE makes sure only one caller restores the stock.
+    """
+    reservation = StockReservation.query.get(reservation_id)
+    if reservation is None or reservation.order_id is not None:
+        return False
+    product_id, shard, quantity = reservation.product_id, reservation.shard, reservation.quantity
+    deleted = (StockReservation.query
+               .filter_by(id=reservation_id, order_id=None)
+               .delete(synchronize_session=False))
+    if deleted != 1:
+        db.session.rollback()
+        return False
+    if shard is None:
+        db.session.execute(update(Product)
+                           .where(Product.id == product_id, Product.stock.isnot(None))
+                           .values(stock=Product.stock + quantity, updated_at=Product.updated_at))
+    else:
+        db.session.execute(update(StockShard)
+                           .where(StockShard.product_id == product_id, StockShard.shard == shard)
+                           .values(stock=StockShard.stock + quantity))
+    db.session.commit()
+    return True
+
+
+def sweep_expired(batch_size=500):
+    """
+    Release every unconfirmed hold past its expiry. Returns the number released.
+    """
+    released = 0
+    while True:
+        ids = [rid for (rid,) in db.session.query(StockReservation.id)
+               .filter(StockReservation.order_id.is_(None),
+                       StockReservation.expires_at <= datetime.datetime.utcnow())
+               .order_by(StockReservation.id)
+               .limit(batch_size).all()]
+        if not ids:
+            return released
+        for reservation_id in ids:
+            if release(reservation_id):
+                released += 1
+        if len(ids) < batch_size:
+            return released
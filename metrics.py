@@ -0,0 +1,252 @@
+# metrics.py
+
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import Response, current_app, request
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Shard:
+    """
+    The counters of one thread. Only that thread writes to it, so recording
+    takes no lock; readers copy the dicts, which is atomic under the GIL.
+    """
+    __slots__ = ('thread', 'counts', 'histograms')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counts = {}      # (endpoint, method, status) -> requests
+        self.histograms = {}  # (endpoint, method) -> [count per bucket..., +Inf count, sum of seconds]
+
+
+class RequestMetrics:
+    """
+    Per-endpoint request counts and latency histograms, served on /metrics in
+    the Prometheus text format together with pool, cache and limiter gauges.
+
+    With METRICS_MULTIPROC_DIR set, each worker process also writes its counters
+    to <dir>/<pid>.json every METRICS_FLUSH_INTERVAL seconds, and /metrics sums
+    the files of all workers, so any worker of a pre-fork server can answer a scrape.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(None)  # Counters of threads that have exited
+        self._lock = threading.Lock()
+        self.multiproc_dir = None
+        self.flush_interval = 5.0
+        self._next_flush = 0.0
+
+    def init_app(self, app):
+        self.multiproc_dir = app.config.get('METRICS_MULTIPROC_DIR')
+        self.flush_interval = app.config.get('METRICS_FLUSH_INTERVAL', 5.0)
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+        # First, so requests shed by earlier before_request hooks are timed too
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._end_request)
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, endpoint, method, status, seconds):
+        shard = self._shard()
+        key = (endpoint, method, status)
+        shard.counts[key] = shard.counts.get(key, 0) + 1
+        histogram = shard.histograms.get((endpoint, method))
+        if histogram is None:
+            histogram = shard.histograms[(endpoint, method)] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect_left(self.buckets, seconds)] += 1
+        histogram[-1] += seconds
+        if self.multiproc_dir and time.monotonic() >= self._next_flush:
+            self.flush()
+
+    def _start_request(self):
+        self._local.request_started = time.perf_counter()
+        self._local.recorded = False
+
+    def _record(self, status):
+        self._local.recorded = True
+        self.observe(request.endpoint or 'unmatched', request.method, str(status),
+                     time.perf_counter() - self._local.request_started)
+
+    def _finish_request(self, response):
+        self._record(response.status_code)
+        return response
+
+    def _end_request(self, exc):
+        # Unhandled exceptions skip after_request; they become 500s
+        if not getattr(self._local, 'recorded', True):
+            self._record(500)
+        self._local.recorded = True
+
+    @staticmethod
+    def _merge(counts, histograms, shard_counts, shard_histograms):
+        for key, value in shard_counts.items():
+            counts[key] = counts.get(key, 0) + value
+        for key, values in shard_histograms.items():
+            total = histograms.get(key)
+            if total is None:
+                histograms[key] = list(values)
+            else:
+                for i, value in enumerate(values):
+                    total[i] += value
+
+    def snapshot(self):
+        """
+        Return (counts, histograms) summed over every thread of this process.
+        """
+        counts, histograms = {}, {}
+        with self._lock:
+            live = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    self._merge(self._retired.counts, self._retired.histograms,
+                                dict(shard.counts), dict(shard.histograms))
+            self._shards = live
+            self._merge(counts, histograms, self._retired.counts, self._retired.histograms)
+            for shard in live:
+                self._merge(counts, histograms, dict(shard.counts), dict(shard.histograms))
+        return counts, histograms
+
+    def flush(self):
+        """
+        Write this process's counters to its file in METRICS_MULTIPROC_DIR.
+        """
+        self._next_flush = time.monotonic() + self.flush_interval
+        counts, histograms = self.snapshot()
+        data = {'counts': [list(key) + [value] for key, value in counts.items()],
+                'histograms': [list(key) + [values] for key, values in histograms.items()]}
+        path = os.path.join(self.multiproc_dir, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        """
+        Return (counts, histograms) for every worker when running multi-process,
+        otherwise for this process.
+        """
+        if not self.multiproc_dir:
+            return self.snapshot()
+        self.flush()
+        counts, histograms = {}, {}
+        for path in glob.glob(os.path.join(self.multiproc_dir, '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue  # Being replaced right now; picked up on the next scrape
+            self._merge(counts, histograms,
+                        {tuple(row[:-1]): row[-1] for row in data['counts']},
+                        {tuple(row[:-1]): row[-1] for row in data['histograms']})
+        return counts, histograms
+
+
+request_metrics = RequestMetrics()
+
+
+def _labels(**labels):
+    return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                          for name, value in labels.items()) + '}'
+
+
+def _format_requests(lines, counts, histograms, buckets):
+    lines.append('# HELP http_requests_total HTTP requests by endpoint, method and status.')
+    lines.append('# TYPE http_requests_total counter')
+    for (endpoint, method, status), value in sorted(counts.items()):
+        lines.append(f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {value}')
+    lines.append('# HELP http_request_duration_seconds Request latency by endpoint and method.')
+    lines.append('# TYPE http_request_duration_seconds histogram')
+    for (endpoint, method), values in sorted(histograms.items()):
+        cumulative = 0
+        for bound, value in zip(buckets + (float('inf'),), values):
+            cumulative += value
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append('http_request_duration_seconds_bucket'
+                         f'{_labels(endpoint=endpoint, method=method, le=le)} {cumulative}')
+        lines.append(f'http_request_duration_seconds_sum{_labels(endpoint=endpoint, method=method)} {values[-1]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{_labels(endpoint=endpoint, method=method)} {cumulative}')
+
+
+def _gauge(lines, name, help_text, samples, kind='gauge'):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+    for labels, value in samples:
+        lines.append(f'{name}{_labels(**labels)} {value}')
+
+
+def _format_process(lines):
+    # Imported here: these modules pull in the models and the app's extensions
+    from catalog import catalog_cache
+    from identity import identity_cache
+    from auth_tokens import token_verifier
+    from database import read_router
+    from passwords import password_hasher
+    from ratelimit import throttle
+
+    pid = os.getpid()
+    db_stats = read_router.stats()
+    pools = [(name, stats) for name, stats in db_stats.items() if name in ('primary', 'replica')]
+    for field, help_text, kind in (('size', 'Configured pool size.', 'gauge'),
+                                   ('checked_out', 'Connections currently checked out.', 'gauge'),
+                                   ('overflow', 'Connections open beyond the pool size.', 'gauge'),
+                                   ('checkouts', 'Connection checkouts.', 'counter'),
+                                   ('checkout_timeouts', 'Checkouts that timed out.', 'counter'),
+                                   ('wait_seconds_total', 'Time spent waiting for a connection.', 'counter')):
+        _gauge(lines, f'db_pool_{field}', help_text,
+               [({'pid': pid, 'database': name}, stats[field]) for name, stats in pools if field in stats], kind)
+
+    caches = [('catalog_products', catalog_cache.products.stats()),
+              ('catalog_lists', catalog_cache.lists.stats()),
+              ('identity', identity_cache.stats()),
+              ('verified_jwt', token_verifier.stats())]
+    for field, help_text, kind in (('hits', 'Cache hits.', 'counter'),
+                                   ('misses', 'Cache misses.', 'counter'),
+                                   ('hit_ratio', 'Cache hits / lookups since start.', 'gauge'),
+                                   ('size', 'Entries in the cache.', 'gauge')):
+        _gauge(lines, f'cache_{field}', help_text,
+               [({'pid': pid, 'cache': name}, stats[field]) for name, stats in caches], kind)
+
+    hasher = password_hasher.metrics()
+    _gauge(lines, 'password_hash_queue_depth', 'Password hashes queued or running.',
+           [({'pid': pid}, hasher['queue_depth'])])
+    _gauge(lines, 'password_hash_rejected_total', 'Password hashes refused because the queue was full.',
+           [({'pid': pid}, hasher['rejected'])], 'counter')
+    pools = throttle.stats()
+    _gauge(lines, 'requests_in_flight', 'Requests holding a concurrency slot.',
+           [({'pid': pid, 'pool': name}, stats['in_flight']) for name, stats in pools.items()])
+    _gauge(lines, 'requests_shed_total', 'Requests answered 503 for lack of a concurrency slot.',
+           [({'pid': pid, 'pool': name}, stats['shed']) for name, stats in pools.items()], 'counter')
+
+
+def metrics_view():
+    """
+    Prometheus text exposition of request, pool, cache and limiter metrics.
+    Requires 'Authorization: Bearer <METRICS_TOKEN>' when METRICS_TOKEN is set.
+    """
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    counts, histograms = request_metrics.collect()
+    lines = []
+    _format_requests(lines, counts, histograms, request_metrics.buckets)
+    _format_process(lines)
+    return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
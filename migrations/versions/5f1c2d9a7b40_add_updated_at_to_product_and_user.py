@@ -0,0 +1,31 @@
+"""Add updated_at to product and user for conditional GETs.
+
+Revision ID: 5f1c2d9a7b40
+Revises: 2bce88b07b38
+Create Date: 2026-10-17 09:12:31.402118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f1c2d9a7b40'
+down_revision = '2bce88b07b38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows are backfilled by the server default
+    op.add_column('product', sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("(now() at time zone 'utc')")))
+    op.create_index(op.f('ix_product_updated_at'), 'product', ['updated_at'], unique=False)
+    op.add_column('user', sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                    server_default=sa.text("(now() at time zone 'utc')")))
+
+
+def downgrade():
+    op.drop_column('user', 'updated_at')
+    op.drop_index(op.f('ix_product_updated_at'), table_name='product')
+    op.drop_column('product', 'updated_at')
@@ -0,0 +1,34 @@
+"""Add a generated tsvector column and GIN index for product search.
+
+Revision ID: 8a3e6c1f0d52
+Revises: 5f1c2d9a7b40
+Create Date: 2026-10-17 10:02:47.118930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3e6c1f0d52'
+down_revision = '5f1c2d9a7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Kept in sync by PostgreSQL itself; search.py queries it with the same 'english' config
+    op.execute("""
+        ALTER TABLE product ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(description, '')), 'B')
+        ) STORED
+    """)
+    op.create_index('ix_product_search_vector', 'product', ['search_vector'],
+                    unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_product_search_vector', table_name='product')
+    op.drop_column('product', 'search_vector')
@@ -0,0 +1,26 @@
+"""Add a unique, nullable product SKU for bulk upserts.
+
+Revision ID: a9c4e2f6d310
+Revises: f7d3b1e8a4c6
+Create Date: 2026-10-17 18:22:41.519304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c4e2f6d310'
+down_revision = 'f7d3b1e8a4c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('product', sa.Column('sku', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_product_sku'), 'product', ['sku'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_product_sku'), table_name='product')
+    op.drop_column('product', 'sku')
@@ -0,0 +1,32 @@
+"""Add cart_line table for server-side carts.
+
+Revision ID: b71d4e2a9c63
+Revises: 8a3e6c1f0d52
+Create Date: 2026-10-17 11:20:05.640271
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71d4e2a9c63'
+down_revision = '8a3e6c1f0d52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cart_line',
+    sa.Column('cart_id', sa.String(length=64), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('cart_id', 'product_id')
+    )
+    op.create_index(op.f('ix_cart_line_expires_at'), 'cart_line', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_cart_line_expires_at'), table_name='cart_line')
+    op.drop_table('cart_line')
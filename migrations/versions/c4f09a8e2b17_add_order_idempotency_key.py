@@ -0,0 +1,26 @@
+"""Add idempotency_key to order.
+
+Revision ID: c4f09a8e2b17
+Revises: b71d4e2a9c63
+Create Date: 2026-10-17 12:41:52.930514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f09a8e2b17'
+down_revision = 'b71d4e2a9c63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('order', sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_order_user_idempotency_key', 'order', ['user_id', 'idempotency_key'])
+
+
+def downgrade():
+    op.drop_constraint('uq_order_user_idempotency_key', 'order', type_='unique')
+    op.drop_column('order', 'idempotency_key')
@@ -0,0 +1,48 @@
+"""Add product stock, stock shards and stock reservations.
+
+Revision ID: d2a7b5c3e981
+Revises: c4f09a8e2b17
+Create Date: 2026-10-17 13:55:10.274406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a7b5c3e981'
+down_revision = 'c4f09a8e2b17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('product', sa.Column('stock', sa.Integer(), nullable=True))
+    op.add_column('product', sa.Column('stock_shards', sa.Integer(), nullable=False, server_default='0'))
+    op.create_table('stock_shard',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('product_id', 'shard')
+    )
+    op.create_table('stock_reservation',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_stock_reservation_expires_at'), 'stock_reservation', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_stock_reservation_expires_at'), table_name='stock_reservation')
+    op.drop_table('stock_reservation')
+    op.drop_table('stock_shard')
+    op.drop_column('product', 'stock_shards')
+    op.drop_column('product', 'stock')
@@ -0,0 +1,27 @@
+"""Add a unique index on lower(email).
+
+Fails if existing users share an email that differs only in case; merge or
+rename those accounts first.
+
+Revision ID: f7d3b1e8a4c6
+Revises: e5c1a7f3b902
+Create Date: 2026-10-17 15:41:09.836712
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7d3b1e8a4c6'
+down_revision = 'e5c1a7f3b902'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_email_lower', 'user', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_user_email_lower', table_name='user')
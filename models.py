@@ -1,5 +1,6 @@
 # models.py
 
+import datetime
 from extensions import db
 from flask_login import UserMixin
 
@@ -19,30 +20,92 @@ class User(db.Model, UserMixin):
     country = db.Column(db.String(100), nullable=False)
     phone_number = db.Column(db.String(20), nullable=False)
     role = db.Column(db.String(50), nullable=False, default='user')
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow,
+                           onupdate=datetime.datetime.utcnow)  # Drives ETag / Last-Modified
 
     orders = db.relationship('Order', backref='user', lazy=True)  # One-to-Many relationship
 
+    __table_args__ = (
+        db.Index('ix_user_email_lower', db.func.lower(email), unique=True),  # Case-insensitive uniqueness and lookups
+    )
+
 class Product(db.Model):
+    # On PostgreSQL the table also has a generated search_vector column (see search.py and below)
     id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(64), nullable=True, unique=True, index=True)  # Supplier key for bulk upserts
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=False)
     price = db.Column(db.Numeric(10, 2), nullable=False)  # Using Numeric for currency
     image_url = db.Column(db.String(255), nullable=False)
+    stock = db.Column(db.Integer, nullable=True)  # NULL means stock is not tracked
+    stock_shards = db.Column(db.Integer, nullable=False, default=0)  # > 0: stock lives in StockShard rows
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow,
+                           onupdate=datetime.datetime.utcnow, index=True)  # Drives ETag / Last-Modified
 
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
 
+# create_all() (setup_db.py) adds the search_vector column that migration
+# 8a3e6c1f0d52 creates, so full-text search works on a fresh schema too
+db.event.listen(Product.__table__, 'after_create', db.DDL("""
+    ALTER TABLE product ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ) STORED
+""").execute_if(dialect='postgresql'))
+db.event.listen(Product.__table__, 'after_create', db.DDL(
+    'CREATE INDEX ix_product_search_vector ON product USING gin (search_vector)'
+).execute_if(dialect='postgresql'))
+
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    order_date = db.Column(db.DateTime, nullable=False, default=db.func.now())
+    order_date = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
     total_amount = db.Column(db.Numeric(10, 2), nullable=False)
     status = db.Column(db.String(50), nullable=False, default='Pending')  # e.g., Pending, Shipped, Delivered
+    idempotency_key = db.Column(db.String(64), nullable=True)  # Client supplied, guards against double submits
 
     items = db.relationship('OrderItem', backref='order', lazy=True)
 
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_order_user_idempotency_key'),
+    )
+
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
     price_at_purchase = db.Column(db.Numeric(10, 2), nullable=False)  # Captures product price at the time of order
+
+class CartLine(db.Model):
+    cart_id = db.Column(db.String(64), primary_key=True)  # 'user:<id>' or a random anonymous id
+    product_id = db.Column(db.Integer, primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+class StockShard(db.Model):
+    # Splits the stock of a hot product over several rows to spread lock contention
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True)
+    stock = db.Column(db.Integer, nullable=False, default=0)
+
+class StockReservation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    shard = db.Column(db.Integer, nullable=True)  # Set when taken from a StockShard
+    quantity = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=True)  # Set once confirmed
+
+class RefreshToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the token, which is never stored
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    family = db.Column(db.String(32), nullable=False, index=True)  # Every token rotated from one login
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    used_at = db.Column(db.DateTime, nullable=True)  # Set once rotated or revoked
+
+class RevokedToken(db.Model):
+    jti = db.Column(db.String(32), primary_key=True)  # Access token id
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)  # The token's exp; the row is useless after it
@@ -0,0 +1,112 @@
+# order_service.py
+
+import datetime
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+from extensions import db
+from models import Order, OrderItem
+from pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from cart_service import to_money
+from inventory import OutOfStock, reserve_items
+
+
+def find_order(user_id, idempotency_key):
+    if not idempotency_key:
+        return None
+    return Order.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+
+
+def place_order(user_id, priced, idempotency_key=None):
+    """
+    Persist an order for a cart priced by CartService in one transaction.
+
+    Stock is taken first with one conditional UPDATE for all lines (see
+    inventory.reserve_items); OutOfStock is raised and nothing is written if any
+    line is short. The order row is inserted next to get its id, then every item
+    goes in as a single multi-row INSERT with price_at_purchase taken from the same batched
+    price read, so the number of round trips does not depend on the number of
+    lines. A repeated idempotency_key returns the order created the first time.
+    Returns (order, created).
+    """
+    existing = find_order(user_id, idempotency_key)
+    if existing:
+        return existing, False
+
+    try:
+        reserve_items(priced.items)
+        order = Order(user_id=user_id, total_amount=priced.total, status='Pending',
+                      idempotency_key=idempotency_key or None)
+        db.session.add(order)
+        db.session.flush()
+
+        db.session.execute(OrderItem.__table__.insert().values([{
+            'order_id': order.id,
+            'product_id': item['product'].id,
+            'quantity': item['quantity'],
+            'price_at_purchase': to_money(item['product'].price)
+        } for item in priced.items]))
+        db.session.commit()
+    except OutOfStock:
+        db.session.rollback()
+        raise
+    except IntegrityError:
+        # A concurrent request with the same key won the race
+        db.session.rollback()
+        existing = find_order(user_id, idempotency_key)
+        if existing is None:
+            raise
+        return existing, False
+    return order, True
+
+
+def order_to_dict(order):
+    return {
+        'id': order.id,
+        'order_date': order.order_date.isoformat(),
+        'status': order.status,
+        'total_amount': str(order.total_amount),
+        'items': [{
+            'product_id': item.product_id,
+            'name': item.product.name if item.product else None,
+            'quantity': item.quantity,
+            'price_at_purchase': str(item.price_at_purchase)
+        } for item in order.items]
+    }
+
+
+def _with_items(query):
+    # One query for the orders, one for all their items joined to their products
+    return query.options(selectinload(Order.items).joinedload(OrderItem.product))
+
+
+def order_history_page(user_id, after=None, limit=10):
+    """
+    Return one page of a user's orders, newest first, with items and products
+    eagerly loaded: the page costs the same number of queries however many
+    orders and items it holds.
+    Keyset-paginated over (order_date, id); `after` is a cursor from the
+    previous page. Returns (orders, next_cursor); raises InvalidCursor.
+    """
+    decoded = None
+    if after:
+        order_date, last_id = decode_cursor(after, '-order_date')
+        try:
+            decoded = (datetime.datetime.fromisoformat(order_date), last_id)
+        except ValueError:
+            raise InvalidCursor('Invalid cursor')
+
+    query = _with_items(Order.query.filter(Order.user_id == user_id))
+    orders, has_more = keyset_page(query, Order.order_date, Order.id,
+                                   after=decoded, descending=True, limit=limit)
+    next_cursor = None
+    if has_more and orders:
+        last = orders[-1]
+        next_cursor = encode_cursor('-order_date', last.order_date, last.id)
+    return orders, next_cursor
+
+
+def get_order(order_id):
+    """
+    Load one order with its items and products, or None.
+    """
+    return _with_items(Order.query.filter(Order.id == order_id)).first()
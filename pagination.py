@@ -0,0 +1,88 @@
+# pagination.py
+
+import base64
+import json
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    """Raised when an `after` cursor cannot be decoded or does not match the sort."""
+
+
+def parse_sort(sort, allowed):
+    """
+    Parse a sort parameter such as 'price' or '-price'.
+    Returns (field, descending) or raises ValueError for unknown fields.
+    """
+    sort = (sort or 'id').strip()
+    descending = sort.startswith('-')
+    field = sort.lstrip('-')
+    if field not in allowed:
+        raise ValueError(f'Invalid sort field: {field}')
+    return field, descending
+
+
+def parse_limit(value, default, maximum):
+    """
+    Clamp a user supplied page size to [1, maximum].
+    """
+    try:
+        limit = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, maximum))
+
+
+def encode_cursor(sort, sort_value, last_id):
+    """
+    Build an opaque cursor pointing just after the row (sort_value, last_id).
+    """
+    payload = json.dumps([sort, str(sort_value), last_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """
+    Decode a cursor produced by encode_cursor for the given sort.
+    Returns (sort_value, last_id) with sort_value as a string.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, sort_value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        last_id = int(last_id)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        raise InvalidCursor('Invalid cursor')
+    if cursor_sort != sort:
+        raise InvalidCursor('Cursor does not match the requested sort')
+    return sort_value, last_id
+
+
+def keyset_page(query, sort_column, id_column, after=None, descending=False, limit=20):
+    """
+    Fetch one page of `query` ordered by (sort_column, id_column).
+
+    `after` is a decoded (sort_value, last_id) tuple; only rows strictly after it
+    in the chosen order are returned. Only limit + 1 rows are loaded so we can tell
+    whether another page exists without counting the table.
+    Returns (rows, has_more).
+    """
+    if after is not None:
+        sort_value, last_id = after
+        if sort_column is id_column:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        elif descending:
+            query = query.filter(or_(sort_column < sort_value,
+                                     and_(sort_column == sort_value, id_column < last_id)))
+        else:
+            query = query.filter(or_(sort_column > sort_value,
+                                     and_(sort_column == sort_value, id_column > last_id)))
+
+    if sort_column is id_column:
+        order = [id_column.desc() if descending else id_column.asc()]
+    elif descending:
+        order = [sort_column.desc(), id_column.desc()]
+    else:
+        order = [sort_column.asc(), id_column.asc()]
+
+    rows = query.order_by(*order).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
@@ -0,0 +1,172 @@
+# passwords.py
+
+import multiprocessing
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+BCRYPT_COST_RE = re.compile(r'^\$2[abxy]?\$(\d{2})\$')
+
+
+class HasherBusy(Exception):
+    """Raised when a hash could not be computed within the configured timeouts."""
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+
+
+def _check(pw_hash, password):
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), pw_hash.encode('utf-8'))
+    except ValueError:
+        # Malformed stored hash
+        return False
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a dedicated pool of worker processes so a burst of logins
+    cannot pin every request thread on hashing.
+
+    At most `max_pending` hashes may be queued or running; callers wait up to
+    `queue_timeout` seconds for a slot and `timeout` seconds for the result,
+    otherwise HasherBusy is raised. With workers = 0 bcrypt runs inline, which
+    is what CLI tools and tests want.
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.workers = 0
+        self.max_pending = 64
+        self.queue_timeout = 2.0
+        self.timeout = 10.0
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {
+            'hash': [0, 0.0, 0.0],    # count, total seconds, max seconds
+            'verify': [0, 0.0, 0.0],
+        }
+        self.rejected = 0
+        self.timeouts = 0
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 0)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', 64)
+        self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2.0)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10.0)
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self.shutdown()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # Forking a process that already runs request threads is unsafe;
+                    # the fork server starts workers from a clean, single-threaded process
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+        return self._executor
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _run(self, kind, fn, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy('Password hashing queue is full')
+        with self._lock:
+            self._pending += 1
+        started = time.perf_counter()
+        future = None
+        try:
+            if self.workers <= 0:
+                result = fn(*args)
+            else:
+                future = self._get_executor().submit(fn, *args)
+                try:
+                    result = future.result(timeout=self.timeout)
+                except FutureTimeout:
+                    # Take it off the queue; a job already hashing keeps its slot until it ends
+                    future.cancel()
+                    with self._lock:
+                        self.timeouts += 1
+                    raise HasherBusy('Password hashing timed out')
+                except BrokenProcessPool:
+                    # A worker died; start a fresh pool for the next caller
+                    self.shutdown()
+                    raise HasherBusy('Password hashing pool restarted')
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                stats = self._stats[kind]
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+            if future is None:
+                self._release()
+            else:
+                # Runs right away unless the job is still running in a worker
+                future.add_done_callback(self._release)
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def generate_password_hash(self, password):
+        return self._run('hash', _hash, password, self.rounds)
+
+    def check_password_hash(self, pw_hash, password):
+        return self._run('verify', _check, pw_hash, password)
+
+    def needs_rehash(self, pw_hash):
+        """
+        True when the stored hash was made with a different cost than configured.
+        """
+        match = BCRYPT_COST_RE.match(pw_hash or '')
+        return match is None or int(match.group(1)) != self.rounds
+
+    def metrics(self):
+        with self._lock:
+            metrics = {
+                'workers': self.workers,
+                'rounds': self.rounds,
+                'max_pending': self.max_pending,
+                'queue_depth': self._pending,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+            for kind, (count, total, longest) in self._stats.items():
+                metrics[f'{kind}_count'] = count
+                metrics[f'{kind}_seconds_total'] = round(total, 6)
+                metrics[f'{kind}_seconds_avg'] = round(total / count, 6) if count else 0.0
+                metrics[f'{kind}_seconds_max'] = round(longest, 6)
+            return metrics
+
+
+password_hasher = PasswordHasher()
+
+
+def verify_and_upgrade(user, password):
+    """
+    Check `password` against `user.password`. On success, transparently rehash
+    it when the configured cost changed; the caller commits.
+    """
+    if not user or not password or not password_hasher.check_password_hash(user.password, password):
+        return False
+    if password_hasher.needs_rehash(user.password):
+        user.password = password_hasher.generate_password_hash(password)
+    return True
@@ -0,0 +1,236 @@
+# product_feed.py
+
+import codecs
+import csv
+import datetime
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import and_, or_
+from extensions import db
+from models import Product
+
+# Supplier feeds: products keyed by SKU, as JSON Lines or CSV. Rows are read
+# and validated one at a time straight off the request stream and written in
+# chunks, each chunk one INSERT ... ON CONFLICT (sku) DO UPDATE and one commit,
+# so memory and transaction size are bounded by the chunk size, not the feed.
+
+FEED_FORMATS = {
+    'application/x-ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'text/csv': 'csv',
+}
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+REQUIRED_FIELDS = ('sku', 'name', 'description', 'price', 'image_url')
+EXPORT_FIELDS = ('id', 'sku', 'name', 'description', 'price', 'image_url', 'stock', 'stock_shards', 'updated_at')
+MAX_LENGTHS = {'sku': 64, 'name': 255, 'image_url': 255}
+MAX_PRICE = Decimal('99999999.99')  # Numeric(10, 2)
+MAX_STOCK = 2 ** 31 - 1  # Integer column
+# psycopg2 sends an executemany as execute_values pages of 1000 rows and only
+# reports the rowcount of the last page, so larger chunks would miscount
+MAX_CHUNK_SIZE = 1000
+CENT = Decimal('0.01')
+
+
+class FeedError(ValueError):
+    """
+    The feed as a whole cannot be read: bad CSV header, bad encoding.
+    """
+
+
+def read_feed(stream, fmt):
+    """
+    Yield (line, data, error) for every row of a binary JSON Lines or CSV
+    stream. `data` is a dict, or None when the row itself could not be parsed.
+    Empty CSV cells come through as None.
+    """
+    lines = codecs.iterdecode(stream, 'utf-8-sig')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(lines)
+            missing = [field for field in REQUIRED_FIELDS if field not in (reader.fieldnames or ())]
+            if missing:
+                raise FeedError(f"CSV header is missing {', '.join(missing)}")
+            for row in reader:
+                if None in row:
+                    yield reader.line_num, None, 'Row has more fields than the header'
+                else:
+                    yield reader.line_num, {k: v if v != '' else None for k, v in row.items()}, None
+        else:
+            for line, text in enumerate(lines, 1):
+                if not text.strip():
+                    continue
+                try:
+                    data = json.loads(text)
+                except ValueError:
+                    yield line, None, 'Invalid JSON'
+                    continue
+                if isinstance(data, dict):
+                    yield line, data, None
+                else:
+                    yield line, None, 'Expected a JSON object'
+    except UnicodeDecodeError:
+        raise FeedError('Feed is not valid UTF-8')
+    except csv.Error as e:
+        raise FeedError(f'Malformed CSV: {e}')
+
+
+def validate_row(data):
+    """
+    Return (values, None) for a valid feed row, or (None, error).
+    'stock' is optional; when present it must be a non-negative integer or null.
+    """
+    values = {}
+    for field in ('sku', 'name', 'description', 'image_url'):
+        value = data.get(field)
+        if not isinstance(value, str) or not value.strip():
+            return None, f'{field} is required'
+        if field in MAX_LENGTHS and len(value) > MAX_LENGTHS[field]:
+            return None, f'{field} is longer than {MAX_LENGTHS[field]} characters'
+        values[field] = value
+    values['sku'] = values['sku'].strip()
+
+    price = data.get('price')
+    if price is None or isinstance(price, bool):
+        return None, 'price is required'
+    try:
+        price = Decimal(str(price))
+    except InvalidOperation:
+        return None, 'Price must be a number'
+    if not price.is_finite() or price < 0 or price > MAX_PRICE or price != price.quantize(CENT):
+        return None, f'Price must be between 0 and {MAX_PRICE} with at most two decimals'
+    values['price'] = price
+
+    if 'stock' in data:
+        stock = data['stock']
+        if isinstance(stock, str) and stock.isdecimal():
+            stock = int(stock)
+        if stock is not None and (not isinstance(stock, int) or isinstance(stock, bool)
+                                  or not 0 <= stock <= MAX_STOCK):
+            return None, f'Stock must be an integer between 0 and {MAX_STOCK} or null'
+        values['stock'] = stock
+    return values, None
+
+
+def _insert(table):
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f'Bulk upserts are not supported on {dialect}')
+    return insert(table)
+
+
+def _upsert(rows, with_stock):
+    """
+    Insert or update `rows` (distinct SKUs) with one executemany of a single
+    INSERT ... ON CONFLICT, which compiles once and is cached; psycopg2 sends it
+    as multi-row VALUES pages. Rows whose values are all unchanged are not
+    touched, so updated_at and the catalog ETags only move for real changes.
+    Returns the number of rows written.
+    """
+    table = Product.__table__
+    now = datetime.datetime.utcnow()
+    stmt = _insert(table)
+    excluded = stmt.excluded
+    changes = {field: excluded[field] for field in ('name', 'description', 'price', 'image_url')}
+    changed = [table.c[field] != excluded[field] for field in changes]
+    if with_stock:
+        # Sharded stock is left alone; it is set through PUT /api/products/<id>
+        unsharded = table.c.stock_shards == 0
+        changes['stock'] = db.case((unsharded, excluded.stock), else_=table.c.stock)
+        changed.append(and_(unsharded, table.c.stock.is_distinct_from(excluded.stock)))
+    changes['updated_at'] = excluded.updated_at
+    stmt = stmt.on_conflict_do_update(index_elements=[table.c.sku], set_=changes, where=or_(*changed))
+    params = [dict(row, stock=row.get('stock'), stock_shards=0, updated_at=now) for row in rows]
+    return db.session.execute(stmt, params).rowcount
+
+
+def import_products(stream, fmt, chunk_size=1000, max_errors=1000):
+    """
+    Upsert the products of a feed, matched on SKU, and return a report:
+      rows      - rows read
+      written   - rows inserted or changed
+      unchanged - valid rows identical to the stored product
+      rejected  - invalid rows, the first `max_errors` listed in 'errors'
+      chunks    - chunks upserted and committed
+      error     - only if the feed could not be read to the end
+    Every chunk is committed on its own, so rows before a failure stay written.
+    When a SKU appears more than once, the last row wins. `chunk_size` is
+    capped at MAX_CHUNK_SIZE.
+    """
+    report = {'rows': 0, 'written': 0, 'unchanged': 0, 'rejected': 0, 'chunks': 0, 'errors': []}
+    chunk = {}
+    chunk_size = min(chunk_size, MAX_CHUNK_SIZE)
+
+    def flush():
+        for with_stock in (False, True):
+            rows = [row for row in chunk.values() if ('stock' in row) == with_stock]
+            if rows:
+                written = _upsert(rows, with_stock)
+                report['written'] += written
+                report['unchanged'] += len(rows) - written
+        db.session.commit()
+        report['chunks'] += 1
+        chunk.clear()
+
+    try:
+        for line, data, error in read_feed(stream, fmt):
+            report['rows'] += 1
+            values = None
+            if error is None:
+                values, error = validate_row(data)
+            if error:
+                report['rejected'] += 1
+                if len(report['errors']) < max_errors:
+                    sku = data.get('sku') if data else None
+                    report['errors'].append({'line': line, 'sku': sku, 'error': error})
+                continue
+            # A repeated SKU starts a new chunk: one statement cannot update a row twice
+            if len(chunk) >= chunk_size or values['sku'] in chunk:
+                flush()
+            chunk[values['sku']] = values
+    except FeedError as e:
+        report['error'] = str(e)
+    if chunk:
+        flush()
+    return report
+
+
+def _export_values(row):
+    values = row._asdict()
+    values['price'] = str(values['price'])
+    values['updated_at'] = values['updated_at'].isoformat()
+    return values
+
+
+def export_products(fmt, batch_size=1000):
+    """
+    Yield the catalog, ordered by id, as NDJSON or CSV text. Rows come from a
+    server-side cursor `batch_size` at a time and each batch is yielded as one
+    string, so memory use does not grow with the catalog. CSV leaves nulls empty.
+    """
+    columns = [getattr(Product, field) for field in EXPORT_FIELDS]
+    rows = (db.session.query(*columns)
+            .order_by(Product.id)
+            .execution_options(stream_results=True)
+            .yield_per(batch_size))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(EXPORT_FIELDS)
+    for count, row in enumerate(rows, 1):
+        values = _export_values(row)
+        if writer:
+            writer.writerow(values.values())
+        else:
+            buffer.write(json.dumps(values) + '\n')
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,294 @@
+# profiling.py
+
+import hashlib
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from itertools import count
+from flask import g, request
+from invalidation import invalidation_bus
+
+logger = logging.getLogger(__name__)
+
+# A signed header profiles one request regardless of sampling:
+#   X-Profile: <unix expiry>:<hex HMAC-SHA256 of "<expiry>:<path>" with PROFILE_SIGNING_KEY>
+# `flask profile-header <path>` prints one.
+PROFILE_HEADER = 'X-Profile'
+_PROFILE_ENVIRON = 'HTTP_X_PROFILE'
+
+
+class _Target:
+    """
+    An endpoint being profiled, and everything collected for it so far.
+    """
+
+    def __init__(self, endpoint, sample_rate, requests, expires_at):
+        self.endpoint = endpoint
+        self.sample_rate = sample_rate
+        self.remaining = requests
+        self.expires_at = expires_at
+        self.profiled = 0
+        self.stats = None       # pstats.Stats summed over the profiled requests
+        self.stacks = Counter()  # collapsed stack -> samples
+
+    def describe(self):
+        return {'endpoint': self.endpoint, 'sample_rate': self.sample_rate,
+                'remaining': self.remaining, 'profiled': self.profiled,
+                'expires_in': max(0, round(self.expires_at - time.time()))}
+
+
+class RequestProfiler:
+    """
+    Profiles a sampled fraction of the requests to chosen endpoints.
+
+    start() arms an endpoint on every worker (through the invalidation bus);
+    each worker then runs cProfile on about `sample_rate` of that endpoint's
+    requests while a background thread samples their stacks every
+    PROFILE_STACK_INTERVAL seconds. When the request count or time window runs
+    out, the aggregated .prof (pstats) and .collapsed (flame graph input) files
+    are written to PROFILE_DIR, oldest files being deleted beyond PROFILE_MAX_BYTES.
+
+    With nothing armed and no PROFILE_SIGNING_KEY, the per-request cost is two attribute checks.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.max_bytes = 100 * 1024 * 1024
+        self.stack_interval = 0.005
+        self.signing_key = None
+        self._targets = {}  # endpoint -> _Target
+        self._active = {}   # thread ident -> _Target being profiled on that thread
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler = None
+        self._sequence = count(1)
+
+    def init_app(self, app):
+        self.directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.max_bytes = app.config.get('PROFILE_MAX_BYTES', self.max_bytes)
+        self.stack_interval = app.config.get('PROFILE_STACK_INTERVAL', self.stack_interval)
+        self.signing_key = app.config.get('PROFILE_SIGNING_KEY')
+        app.before_request(self._start_request)
+        app.teardown_request(self._end_request)
+
+    # Arming
+
+    def start(self, endpoint, sample_rate, requests, seconds):
+        """
+        Profile up to `requests` requests to `endpoint` on each worker over the
+        next `seconds`, picking each request with probability `sample_rate`.
+        """
+        invalidation_bus.publish(f'profile:start:{endpoint}:{sample_rate}:{requests}:{time.time() + seconds}')
+
+    def stop(self, endpoint):
+        """
+        Stop profiling `endpoint` on every worker, writing what was collected.
+        """
+        invalidation_bus.publish(f'profile:stop:{endpoint}')
+
+    def _arm(self, endpoint, sample_rate, requests, expires_at):
+        with self._lock:
+            finished = self._targets.pop(endpoint, None)
+            self._targets[endpoint] = _Target(endpoint, sample_rate, requests, expires_at)
+        if finished is not None:
+            self._write(finished)
+
+    def _disarm(self, endpoint):
+        with self._lock:
+            target = self._targets.pop(endpoint, None)
+        if target is not None:
+            self._write(target)
+
+    def _expire(self):
+        now = time.time()
+        with self._lock:
+            expired = [t for t in self._targets.values() if t.expires_at <= now or t.remaining <= 0]
+            for target in expired:
+                del self._targets[target.endpoint]
+        for target in expired:
+            self._write(target)
+
+    def active(self):
+        self._expire()
+        with self._lock:
+            return [target.describe() for target in self._targets.values()]
+
+    # Request hooks
+
+    def _pick(self):
+        header = request.environ.get(_PROFILE_ENVIRON)
+        if header and self.verify_header(header, request.path):
+            return _Target(request.endpoint or 'unmatched', 1.0, 1, 0)
+        target = self._targets.get(request.endpoint)
+        if target is None or random.random() >= target.sample_rate:
+            return None
+        if target.expires_at <= time.time() or target.remaining <= 0:
+            self._expire()
+            return None
+        return target
+
+    def _start_request(self):
+        if not self._targets and (not self.signing_key or _PROFILE_ENVIRON not in request.environ):
+            return
+        target = self._pick()
+        if target is None:
+            return
+        import cProfile
+        g.profile = (target, cProfile.Profile())
+        with self._lock:
+            self._active[threading.get_ident()] = target
+        self._ensure_sampler()
+        try:
+            g.profile[1].enable()
+        except ValueError:
+            # Python 3.12+ allows one cProfile per process; another request (or a
+            # debugger) holds it, so this one is served unprofiled
+            g.pop('profile')
+            with self._lock:
+                self._active.pop(threading.get_ident(), None)
+
+    def _end_request(self, exc):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return
+        import pstats
+        target, profiler = profile
+        profiler.disable()
+        with self._lock:
+            self._active.pop(threading.get_ident(), None)
+            if target.stats is None:
+                target.stats = pstats.Stats(profiler)
+            else:
+                target.stats.add(profiler)
+            target.profiled += 1
+            target.remaining -= 1
+            done = target.remaining <= 0
+            if done and self._targets.get(target.endpoint) is target:
+                del self._targets[target.endpoint]
+        if done:
+            self._write(target)
+
+    # Stack sampling
+
+    def _ensure_sampler(self):
+        self._wake.set()
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._sample, name='request-profiler', daemon=True)
+            self._sampler.start()
+
+    def _sample(self):
+        own = threading.get_ident()
+        while True:
+            self._wake.clear()
+            with self._lock:
+                active = dict(self._active)
+            if not active:
+                # Sleep until the next profiled request
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            samples = []
+            for ident, target in active.items():
+                frame = frames.get(ident)
+                if frame is None or ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                    frame = frame.f_back
+                samples.append((target, ';'.join(reversed(stack))))
+            del frames
+            with self._lock:
+                for target, stack in samples:
+                    target.stacks[stack] += 1
+            time.sleep(self.stack_interval)
+
+    # Output
+
+    def _write(self, target):
+        if not target.profiled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = time.strftime('%Y%m%dT%H%M%S')
+        base = os.path.join(self.directory, f'{target.endpoint}-{stamp}-{os.getpid()}-{next(self._sequence)}')
+        with self._lock:
+            stacks = target.stacks.most_common()
+        try:
+            target.stats.dump_stats(base + '.prof')
+            with open(base + '.collapsed', 'w') as f:
+                for stack, samples in stacks:
+                    f.write(f'{stack} {samples}\n')
+        except OSError:
+            logger.exception('Failed to write profile %s', base)
+            return
+        logger.info('Wrote profile of %d %s requests to %s', target.profiled, target.endpoint, base)
+        self._enforce_cap()
+
+    def files(self):
+        """
+        Profile files on disk, newest first.
+        """
+        if not self.directory or not os.path.isdir(self.directory):
+            return []
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(('.prof', '.collapsed')):
+                stat = entry.stat()
+                files.append({'name': entry.name, 'size': stat.st_size, 'modified': stat.st_mtime})
+        return sorted(files, key=lambda f: f['modified'], reverse=True)
+
+    def _enforce_cap(self):
+        files = self.files()
+        total = sum(f['size'] for f in files)
+        while files and total > self.max_bytes:
+            oldest = files.pop()
+            try:
+                os.remove(os.path.join(self.directory, oldest['name']))
+            except OSError:
+                pass
+            total -= oldest['size']
+
+    # Signed header
+
+    def verify_header(self, value, path):
+        if not self.signing_key:
+            return False
+        expires, _, signature = value.partition(':')
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return hmac.compare_digest(signature, _signature(self.signing_key, expires, path))
+
+
+request_profiler = RequestProfiler()
+
+
+def _signature(key, expires, path):
+    return hmac.new(key.encode(), f'{expires}:{path}'.encode(), hashlib.sha256).hexdigest()
+
+
+def sign_header(key, path, ttl=300):
+    """
+    Return an X-Profile header value that profiles a request to `path` for the next `ttl` seconds.
+    """
+    if not key:
+        raise RuntimeError('PROFILE_SIGNING_KEY is not set')
+    expires = int(time.time()) + ttl
+    return f'{expires}:{_signature(key, expires, path)}'
+
+
+@invalidation_bus.subscribe
+def _profile_events(event):
+    if not event.startswith('profile:'):
+        return
+    _, action, rest = event.split(':', 2)
+    if action == 'start':
+        endpoint, sample_rate, requests, expires_at = rest.rsplit(':', 3)
+        request_profiler._arm(endpoint, float(sample_rate), int(requests), float(expires_at))
+    elif action == 'stop':
+        request_profiler._disarm(rest)
@@ -0,0 +1,199 @@
+# ratelimit.py
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, request
+from werkzeug.exceptions import ServiceUnavailable, TooManyRequests
+
+# Rate limiters answer hit(key, limit, period) with 0 when the request may go
+# ahead, or with the number of seconds to wait before retrying.
+
+
+def parse_limit(value):
+    """
+    Parse '<requests>/<seconds>', e.g. '30/60'. Returns (limit, period).
+    """
+    limit, period = value.split('/')
+    return int(limit), float(period)
+
+
+class MemoryRateLimiter:
+    """
+    Per-process token buckets: each key refills at limit/period tokens a second
+    up to `limit`, so short bursts pass and sustained floods are cut to the rate.
+    Only the `max_keys` most recently seen keys are tracked.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, limit, period):
+        rate = limit / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (limit, now))
+            tokens = min(limit, tokens + (now - last) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0
+            else:
+                retry_after = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+
+class RedisRateLimiter:
+    """
+    Sliding-window counter shared by every worker: one INCR per request on the
+    current fixed window, weighted with the previous window's count.
+    """
+
+    def __init__(self, client, prefix='ratelimit:'):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key, limit, period):
+        now = time.time()
+        window = int(now // period)
+        elapsed = now - window * period
+        current_key = f'{self.prefix}{key}:{window}'
+        current = self.client.incr(current_key)
+        if current == 1:
+            self.client.expire(current_key, int(period * 2))
+        previous = int(self.client.get(f'{self.prefix}{key}:{window - 1}') or 0)
+        if previous * (period - elapsed) / period + current > limit:
+            return period - elapsed
+        return 0
+
+
+def create_rate_limiter(config):
+    """
+    Build the rate limiter selected by RATELIMIT_BACKEND; None turns limiting off.
+    """
+    backend = config.get('RATELIMIT_BACKEND', 'memory')
+    if backend == 'off':
+        return None
+    if backend == 'memory':
+        return MemoryRateLimiter()
+    if backend == 'redis':
+        import redis
+        return RedisRateLimiter(redis.Redis.from_url(config['REDIS_URL']))
+    if backend == 'local-redis':
+        from cart_store import LocalRedis
+        return RedisRateLimiter(LocalRedis())
+    raise ValueError(f'Unknown rate limit backend: {backend}')
+
+
+class ConcurrencyLimiter:
+    """
+    Caps the requests of one pool that run at the same time. A request waits
+    at most `max_wait` seconds for a slot before it is shed.
+    """
+
+    def __init__(self, limit, max_wait):
+        self.limit = limit
+        self.max_wait = max_wait
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.shed = 0
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.max_wait):
+            with self._lock:
+                self.shed += 1
+            return False
+        with self._lock:
+            self.in_flight += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {'limit': self.limit, 'in_flight': self.in_flight, 'shed': self.shed}
+
+
+class Throttle:
+    """
+    Rate limits for the authentication endpoints plus load shedding for every
+    request.
+
+    Views decorated with auth_rate_limited run in their own small concurrency
+    pool, so a credential-stuffing burst, which is mostly bcrypt work, can
+    saturate that pool but never the one serving the catalog.
+    """
+
+    def __init__(self):
+        self.limiter = None
+        self.pools = {}
+
+    def init_app(self, app):
+        self.limiter = create_rate_limiter(app.config)
+        self.per_ip = parse_limit(app.config.get('RATELIMIT_AUTH_PER_IP', '30/60'))
+        self.per_email = parse_limit(app.config.get('RATELIMIT_AUTH_PER_EMAIL', '10/300'))
+        max_wait = app.config.get('LOAD_SHED_MAX_WAIT', 0.5)
+        self.pools = {
+            'default': ConcurrencyLimiter(app.config.get('MAX_CONCURRENT_REQUESTS', 64), max_wait),
+            'auth': ConcurrencyLimiter(app.config.get('MAX_CONCURRENT_AUTH_REQUESTS', 8), max_wait),
+        }
+        app.before_request(self._enter)
+        app.teardown_request(self._exit)
+
+    def _enter(self):
+        view = current_app.view_functions.get(request.endpoint)
+        pool = self.pools[getattr(view, 'concurrency_pool', 'default')]
+        if not pool.acquire():
+            raise ServiceUnavailable('The server is busy, please try again in a moment.', retry_after=1)
+        g.concurrency_pool = pool
+
+    def _exit(self, exc):
+        pool = g.pop('concurrency_pool', None)
+        if pool is not None:
+            pool.release()
+
+    def check_auth(self, email=None):
+        """
+        Count an authentication attempt against the client IP and, when given,
+        the email address; raises TooManyRequests once either is over its limit.
+        """
+        if self.limiter is None:
+            return
+        checks = [(f'auth:ip:{request.remote_addr}', self.per_ip)]
+        if email:
+            checks.append((f'auth:email:{email.strip().lower()}', self.per_email))
+        for key, (limit, period) in checks:
+            retry_after = self.limiter.hit(key, limit, period)
+            if retry_after:
+                raise TooManyRequests('Too many attempts, please try again later.',
+                                      retry_after=math.ceil(retry_after))
+
+    def stats(self):
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+
+throttle = Throttle()
+
+
+def auth_rate_limited(f):
+    """
+    Decorator for login/registration views: rate limits POSTs by IP and email
+    and runs the view in the 'auth' concurrency pool.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if request.method == 'POST':
+            email = request.form.get('email') or (request.get_json(silent=True) or {}).get('email')
+            throttle.check_auth(email if isinstance(email, str) else None)
+        return f(*args, **kwargs)
+    decorated.concurrency_pool = 'auth'
+    return decorated
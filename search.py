@@ -0,0 +1,151 @@
+# search.py
+
+import re
+import threading
+from bisect import bisect_left
+from extensions import db
+from models import Product
+from catalog import product_to_dict
+from invalidation import invalidation_bus
+from database import run_read
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Relative weight of a match in each field (mirrors setweight 'A' / 'B' on PostgreSQL)
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Must match the configuration used by the search_vector column in the migration
+TS_CONFIG = 'english'
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class InvertedIndex:
+    """
+    In-memory inverted index over product names and descriptions, used when the
+    database has no full-text search (SQLite).
+
+    Postings map each term to {product_id: score}. Terms are also kept in a sorted
+    list so prefix lookups are a bisect plus a short scan. The index is rebuilt
+    lazily on the first search after any catalog invalidation. Both are published
+    together as one (terms, postings) tuple, so searches never take the lock and
+    never see a half-built index.
+    """
+
+    def __init__(self):
+        self._index = ([], {})  # (sorted terms, postings)
+        self._stale = True
+        self._lock = threading.Lock()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def build(self, rows):
+        """
+        Index (id, name, description) rows.
+        """
+        postings = {}
+        for product_id, name, description in rows:
+            for weight, text in ((NAME_WEIGHT, name), (DESCRIPTION_WEIGHT, description)):
+                for term in tokenize(text):
+                    docs = postings.setdefault(term, {})
+                    docs[product_id] = docs.get(product_id, 0.0) + weight
+        self._index = (sorted(postings), postings)
+
+    def ensure_fresh(self, load_rows):
+        if not self._stale:
+            return
+        with self._lock:
+            if self._stale:
+                # Cleared before loading, so an invalidation during the rebuild is kept
+                self._stale = False
+                try:
+                    self.build(load_rows())
+                except Exception:
+                    self._stale = True
+                    raise
+
+    @staticmethod
+    def _prefix_matches(index, prefix):
+        terms, postings = index
+        matches = {}
+        i = bisect_left(terms, prefix)
+        while i < len(terms) and terms[i].startswith(prefix):
+            for product_id, score in postings[terms[i]].items():
+                if score > matches.get(product_id, 0.0):
+                    matches[product_id] = score
+            i += 1
+        return matches
+
+    def search(self, terms):
+        """
+        Return [(product_id, score)] for products matching every term as a prefix,
+        best matches first.
+        """
+        index = self._index  # One snapshot for every term of the query
+        scores = None
+        for term in terms:
+            matches = self._prefix_matches(index, term)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pid: s + matches[pid] for pid, s in scores.items() if pid in matches}
+            if not scores:
+                return []
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+memory_index = InvertedIndex()
+
+
+@invalidation_bus.subscribe
+def _on_invalidation(event):
+    if event == 'catalog':
+        memory_index.mark_stale()
+
+
+def _load_index_rows(session):
+    query = session.query(Product.id, Product.name, Product.description)
+    return query.yield_per(10000)
+
+
+def _search_postgresql(session, terms, offset, limit):
+    # 'serum:* & vita:*' - every term must match, each as a prefix
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    match = db.text(f"search_vector @@ to_tsquery('{TS_CONFIG}', :tsquery)")
+    rank = db.text(f"ts_rank(search_vector, to_tsquery('{TS_CONFIG}', :tsquery)) DESC")
+    return (session.query(Product)
+            .filter(match)
+            .order_by(rank, Product.id)
+            .params(tsquery=tsquery)
+            .offset(offset)
+            .limit(limit)
+            .all())
+
+
+def _search_memory(session, terms, offset, limit):
+    memory_index.ensure_fresh(lambda: _load_index_rows(session))
+    ids = [product_id for product_id, _ in memory_index.search(terms)[offset:offset + limit]]
+    if not ids:
+        return []
+    by_id = {p.id: p for p in session.query(Product).filter(Product.id.in_(ids)).all()}
+    return [by_id[product_id] for product_id in ids if product_id in by_id]
+
+
+def search_products(q, page=1, limit=20):
+    """
+    Ranked prefix search over product names and descriptions.
+    Uses the tsvector column and GIN index on PostgreSQL, and the in-memory
+    inverted index elsewhere.
+    Returns (products as dicts, has_more).
+    """
+    terms = tokenize(q)
+    if not terms:
+        return [], False
+    offset = (max(page, 1) - 1) * limit
+    search = _search_postgresql if db.engine.dialect.name == 'postgresql' else _search_memory
+    rows = run_read(lambda session: search(session, terms, offset, limit + 1))
+    return [product_to_dict(p) for p in rows[:limit]], len(rows) > limit
@@ -1,26 +1,29 @@
 # setup_db.py
+#
+# Recreates the database with the admin user and the sample catalog, optionally
+# followed by synthetic data for load testing (see datagen.py):
+#
+#   python3 setup_db.py
+#   python3 setup_db.py --products 1000000 --users 200000 --orders 10000000 --seed 42
 
-from app import app
+import argparse
+import datetime
+from app import create_cli_app
 from extensions import db
 from models import User, Product
-from flask_bcrypt import Bcrypt
+from passwords import password_hasher
+from datagen import generate
 
-bcrypt = Bcrypt(app)
-
-with app.app_context():
-    # Drop all tables (be cautious: this will erase existing data)
-    db.drop_all()
-    # Create all tables
-    db.create_all()
 
+def seed_fixtures():
     # Create an admin user
     admin_user = User(
         email="devdagan@gmail.com",
-        password=bcrypt.generate_password_hash("SecureAdminPass123").decode('utf-8'),  # Choose a strong password
+        password=password_hasher.generate_password_hash("SecureAdminPass123"),  # Choose a strong password
         first_name="Yossi",
         last_name="Dagan",
         display_name="YossiD",
-        date_of_birth="1990-05-15",  # Format: YYYY-MM-DD
+        date_of_birth=datetime.date(1990, 5, 15),
         address_line1="123 Admin Street",
         address_line2="Apt 456",
         city="Tel Aviv",
@@ -100,4 +103,36 @@ with app.app_context():
     db.session.add_all(products)
     db.session.commit()
 
-    print("Database initialized with admin user and products!")
+
+def main():
+    parser = argparse.ArgumentParser(description='Recreate the database and seed it.')
+    parser.add_argument('--products', type=int, default=0, help='Synthetic products to add')
+    parser.add_argument('--users', type=int, default=0, help='Synthetic users to add')
+    parser.add_argument('--orders', type=int, default=0, help='Synthetic orders to add, each with 1..--max-items items')
+    parser.add_argument('--max-items', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1, help='Same seed and counts, same data')
+    parser.add_argument('--password', default='password', help='Password of every synthetic user')
+    parser.add_argument('--chunk-size', type=int, default=20000, help='Rows per COPY / executemany batch')
+    args = parser.parse_args()
+
+    app = create_cli_app()
+    with app.app_context():
+        # Drop all tables (be cautious: this will erase existing data)
+        db.drop_all()
+        # Create all tables
+        db.create_all()
+        seed_fixtures()
+        db.session.remove()
+        print("Database initialized with admin user and products!")
+
+        if args.products or args.users or args.orders:
+            summaries = generate(users=args.users, products=args.products, orders=args.orders, seed=args.seed,
+                                 password=args.password, max_items=args.max_items, chunk_size=args.chunk_size)
+            for summary in summaries:
+                extra = f" (+{summary['order_items']:,} items)" if 'order_items' in summary else ''
+                print(f"{summary['table']:10s} {summary['rows']:>12,} rows{extra} in {summary['seconds']}s, "
+                      f"{summary['rows_per_second']:,} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+# sqlstats.py
+
+import logging
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Frames from these paths are skipped when looking for the code that ran a query
+_LIBRARY_PATHS = (os.path.dirname(logging.__file__), os.sep + 'site-packages' + os.sep, __file__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised after a view in strict mode. It comes from an after_request hook,
+    so it only reaches the caller when the app propagates exceptions (TESTING);
+    otherwise Flask turns it into a 500.
+    """
+
+
+class QueryStats:
+    """
+    Queries run while a collector is active: count, total time and how often
+    each distinct statement ran, with the call site of repeated ones.
+    """
+
+    def __init__(self, repeat_threshold=5):
+        self.repeat_threshold = repeat_threshold
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+        self.repeated = {}  # statement -> call site, once it ran repeat_threshold times
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.seconds += elapsed
+        seen = self.statements[statement] = self.statements.get(statement, 0) + 1
+        if seen == self.repeat_threshold:
+            self.repeated[statement] = call_site()
+
+
+def call_site():
+    """
+    'file:line in function' of the innermost application frame on the stack.
+    """
+    for frame in reversed(traceback.extract_stack()):
+        # '<string>' frames are SQLAlchemy's generated wrappers
+        if not frame.filename.startswith('<') and not any(path in frame.filename for path in _LIBRARY_PATHS):
+            return f'{os.path.relpath(frame.filename)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class SQLInstrumentation:
+    """
+    Optional per-request SQL accounting built on engine events.
+
+    When SQL_INSTRUMENTATION is on, every request gets a QueryStats: the totals
+    go out in a Server-Timing header, statements repeated SQL_N_PLUS_ONE_THRESHOLD
+    times are logged as suspected N+1 with their call site, and queries slower
+    than SQL_SLOW_QUERY_MS are logged. Views can declare a @query_budget;
+    exceeding it is logged, or raises QueryBudgetExceeded with
+    SQL_QUERY_BUDGET_STRICT (meant for tests).
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self.enabled = False
+        self.slow_query_seconds = 0.2
+        self.repeat_threshold = 5
+        self.strict = False
+
+    def init_app(self, app):
+        self.slow_query_seconds = app.config.get('SQL_SLOW_QUERY_MS', 200) / 1000
+        self.repeat_threshold = app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        self.strict = app.config.get('SQL_QUERY_BUDGET_STRICT', False)
+        if not app.config.get('SQL_INSTRUMENTATION'):
+            return
+        if not self.enabled:
+            # Listening on the Engine class covers the primary and the replica
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self.enabled = True
+        app.before_request(self._start_request)
+        app.after_request(self._finish_request)
+        app.teardown_request(self._end_request)
+
+    def _collectors(self):
+        if not hasattr(self._local, 'collectors'):
+            self._local.collectors = []
+        return self._local.collectors
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        for stats in self._collectors():
+            stats.record(statement, elapsed)
+        if elapsed >= self.slow_query_seconds:
+            logger.warning("Slow query (%.1f ms) at %s: %s", elapsed * 1000, call_site(),
+                           ' '.join(statement.split()))
+
+    @contextmanager
+    def collect(self):
+        """
+        Collect the queries run by this thread inside the block:
+
+            with sql_instrumentation.collect() as stats:
+                ...
+            assert stats.count <= 3
+        """
+        stats = QueryStats(self.repeat_threshold)
+        collectors = self._collectors()
+        collectors.append(stats)
+        try:
+            yield stats
+        finally:
+            collectors.remove(stats)
+
+    def _start_request(self):
+        self._local.request_started = time.perf_counter()
+        self._local.request_stats = stats = QueryStats(self.repeat_threshold)
+        self._collectors().append(stats)
+
+    def _finish_request(self, response):
+        stats = getattr(self._local, 'request_stats', None)
+        if stats is None:
+            return response
+        total = time.perf_counter() - self._local.request_started
+        response.headers.add('Server-Timing', f'db;dur={stats.seconds * 1000:.1f};desc="{stats.count} queries"')
+        response.headers.add('Server-Timing', f'app;dur={total * 1000:.1f}')
+        for statement, site in stats.repeated.items():
+            logger.warning("Suspected N+1 in %s: %d runs of %s (first repeated at %s)", request.endpoint,
+                           stats.statements[statement], ' '.join(statement.split()), site)
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', None)
+        if budget is not None and stats.count > budget:
+            message = f'{request.endpoint} ran {stats.count} queries, budget is {budget}'
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def _end_request(self, exc):
+        stats = getattr(self._local, 'request_stats', None)
+        if stats is not None:
+            self._local.request_stats = None
+            self._collectors().remove(stats)
+
+
+sql_instrumentation = SQLInstrumentation()
+
+
+def query_budget(limit):
+    """
+    Decorator declaring the most queries a view may run, cold caches included.
+    """
+    def decorator(f):
+        f.query_budget = limit
+        return f
+    return decorator
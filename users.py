@@ -0,0 +1,113 @@
+# users.py
+
+import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from models import User
+
+# Emails are unique regardless of case: the user table has a unique index on
+# lower(email), and every lookup below goes through that same expression.
+
+ROLES = ('user', 'admin')
+
+
+def find_user_by_email(email):
+    """
+    Return the User with this email, compared case-insensitively, or None.
+    """
+    if not email:
+        return None
+    return User.query.filter(func.lower(User.email) == email.lower()).first()
+
+
+def create_user(**fields):
+    """
+    Insert a user in one INSERT ... ON CONFLICT DO NOTHING and commit.
+    Returns the new user's id, or None if the email is already in use.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(User.__table__).values(**fields).on_conflict_do_nothing()
+    if db.engine.dialect.name == 'postgresql':
+        row = db.session.execute(stmt.returning(User.__table__.c.id)).first()
+        user_id = row[0] if row else None
+    else:
+        # No RETURNING for SQLite in SQLAlchemy 1.4
+        result = db.session.execute(stmt)
+        user_id = result.inserted_primary_key[0] if result.rowcount == 1 else None
+    db.session.commit()
+    return user_id
+
+
+def change_email(user, new_email):
+    """
+    Set a new email on `user` and flush it inside a savepoint, letting the
+    unique index decide whether it is free. Returns False if it is taken;
+    other pending changes to the user are kept either way.
+    """
+    try:
+        with db.session.begin_nested():
+            user.email = new_email
+    except IntegrityError:
+        return False
+    return True
+
+
+def _normalize(key):
+    # Numeric keys are ids, anything else an email
+    key = key.strip()
+    return int(key) if key.isdecimal() else key.lower()
+
+
+def lookup_users(keys, *columns, chunk_size=500):
+    """
+    Look up users by email (case-insensitively) or numeric id, `chunk_size`
+    keys per SELECT ... WHERE ... IN. Yields one list of (key, row or None)
+    per chunk, in input order. Rows are Users unless `columns` are given,
+    which must include User.id and User.email.
+    """
+    keys = list(keys)
+    query = db.session.query(*columns) if columns else User.query
+    for start in range(0, len(keys), chunk_size):
+        chunk = [(key, _normalize(key)) for key in keys[start:start + chunk_size]]
+        ids = {value for _, value in chunk if isinstance(value, int)}
+        emails = {value for _, value in chunk if isinstance(value, str)}
+        found = {}
+        if ids:
+            found.update((row.id, row) for row in query.filter(User.id.in_(ids)))
+        if emails:
+            found.update((row.email.lower(), row) for row in query.filter(func.lower(User.email).in_(emails)))
+        yield [(key, found.get(value)) for key, value in chunk]
+
+
+def set_users_role(keys, role, chunk_size=500, dry_run=False):
+    """
+    Give every user in `keys` (emails or ids) the role `role`. Per chunk: one
+    SELECT to resolve the keys and one UPDATE ... WHERE id IN (...) for the
+    users whose role differs, then a commit and one identity invalidation.
+    Yields a result dict per key; status is 'updated', 'unchanged',
+    'not_found', or 'would_update' when `dry_run` is set.
+    """
+    from identity import invalidate_user
+
+    if role not in ROLES:
+        raise ValueError(f'Unknown role: {role}')
+    for chunk in lookup_users(keys, User.id, User.email, User.role, chunk_size=chunk_size):
+        changing = {row.id for _, row in chunk if row is not None and row.role != role}
+        if changing and not dry_run:
+            (User.query
+             .filter(User.id.in_(changing), User.role != role)
+             .update({'role': role, 'updated_at': datetime.datetime.utcnow()}, synchronize_session=False))
+            db.session.commit()
+            invalidate_user(*changing)
+        for key, row in chunk:
+            if row is None:
+                yield {'key': key, 'id': None, 'email': None, 'old_role': None, 'new_role': None,
+                       'status': 'not_found'}
+                continue
+            status = 'unchanged' if row.id not in changing else 'would_update' if dry_run else 'updated'
+            yield {'key': key, 'id': row.id, 'email': row.email, 'old_role': row.role, 'new_role': role,
+                   'status': status}
@@ -0,0 +1,293 @@
+# views.py
+
+import secrets
+from flask import render_template, request, redirect, url_for, flash, abort
+from flask_login import login_user, current_user, logout_user, login_required
+from config import PRODUCTS_PER_PAGE, FEATURED_PRODUCTS_LIMIT
+from extensions import db, login_manager
+from models import User, Product
+from database import replica_reads
+from sqlstats import query_budget
+from catalog import featured_products, get_product, product_page
+from search import search_products
+from cart_service import priced_current_cart
+from order_service import find_order, order_history_page, place_order
+from inventory import OutOfStock
+from identity import invalidate_user, load_identity
+from ratelimit import auth_rate_limited
+from passwords import HasherBusy, password_hasher, verify_and_upgrade
+from users import change_email, create_user, find_user_by_email
+from cart_store import current_cart, current_cart_id, get_cart_store, merge_anonymous_cart
+
+# The storefront pages. They are added to the app itself rather than through a
+# blueprint so endpoint names ('home', 'product_list', ...) stay unprefixed.
+_routes = []
+
+
+def route(rule, **options):
+    def decorator(f):
+        _routes.append((rule, f, options))
+        return f
+    return decorator
+
+
+def register_views(app):
+    for rule, view, options in _routes:
+        app.add_url_rule(rule, view_func=view, **options)
+    app.register_error_handler(HasherBusy, hasher_busy)
+
+
+def hasher_busy(e):
+    return "The server is busy, please try again in a moment.", 503, {'Retry-After': '1'}
+
+
+# User loader for Flask-Login
+@login_manager.user_loader
+def load_user(user_id):
+    return load_identity(int(user_id))
+
+
+@route('/')
+@replica_reads
+@query_budget(2)
+def home():
+    products = featured_products(FEATURED_PRODUCTS_LIMIT)
+    return render_template('index.html', products=products)
+
+
+@route('/login', methods=['GET', 'POST'])
+@auth_rate_limited
+def login():
+    if current_user.is_authenticated:
+        return redirect(url_for('home'))
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+        user = find_user_by_email(email)
+        if verify_and_upgrade(user, password):
+            db.session.commit()  # Persists a rehash, if there was one
+            login_user(user)
+            merge_anonymous_cart(user.id)
+            flash("Logged in successfully!", "success")
+            return redirect(url_for('home'))
+        else:
+            flash("Invalid credentials", "danger")
+    return render_template('login.html')
+
+
+@route('/logout')
+@login_required
+def logout():
+    logout_user()
+    flash("You have logged out.", "info")
+    return redirect(url_for('home'))
+
+
+@route('/register', methods=['GET', 'POST'])
+@auth_rate_limited
+def register():
+    if current_user.is_authenticated:
+        return redirect(url_for('home'))
+    if request.method == 'POST':
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        first_name = request.form.get('first_name')
+        last_name = request.form.get('last_name')
+        display_name = request.form.get('display_name')
+        date_of_birth = request.form.get('date_of_birth')
+        address_line1 = request.form.get('address_line1')
+        address_line2 = request.form.get('address_line2')
+        city = request.form.get('city')
+        state = request.form.get('state')
+        zip_code = request.form.get('zip_code')
+        country = request.form.get('country')
+        phone_number = request.form.get('phone_number')
+
+        if password != confirm_password:
+            flash("Passwords do not match", "danger")
+            return redirect(url_for('register'))
+
+        hashed_pw = password_hasher.generate_password_hash(password)
+        user_id = create_user(
+            email=email,
+            password=hashed_pw,
+            first_name=first_name,
+            last_name=last_name,
+            display_name=display_name,
+            date_of_birth=date_of_birth,
+            address_line1=address_line1,
+            address_line2=address_line2,
+            city=city,
+            state=state,
+            zip_code=zip_code,
+            country=country,
+            phone_number=phone_number
+        )
+        if user_id is None:
+            flash("Email already in use", "danger")
+            return redirect(url_for('register'))
+        flash("Registration successful! You can now login.", "success")
+        return redirect(url_for('login'))
+
+    return render_template('register.html')
+
+
+@route('/products')
+@replica_reads
+@query_budget(3)
+def product_list():
+    q = request.args.get('q', '').strip()
+    if q:
+        page = request.args.get('page', 1, type=int)
+        products, has_more = search_products(q, page=page, limit=PRODUCTS_PER_PAGE)
+        return render_template('product_list.html', products=products, q=q, page=page,
+                               has_more=has_more)
+
+    sort = request.args.get('sort', 'id')
+    after = request.args.get('after')
+    try:
+        products, next_cursor = product_page(sort=sort, after=after, limit=PRODUCTS_PER_PAGE)
+    except ValueError:
+        # Stale or hand-edited links fall back to the first page
+        return redirect(url_for('product_list'))
+    return render_template('product_list.html', products=products, sort=sort,
+                           after=after, next_cursor=next_cursor)
+
+
+@route('/product/<int:product_id>')
+@replica_reads
+@query_budget(2)
+def product_detail(product_id):
+    product = get_product(product_id)
+    if not product:
+        abort(404)
+    return render_template('product_detail.html', product=product)
+
+
+@route('/add_to_cart/<int:product_id>', methods=['POST'])
+def add_to_cart(product_id):
+    product = Product.query.get_or_404(product_id)
+    quantity = int(request.form.get('quantity', 1))
+    if quantity > 0:
+        get_cart_store().incr(current_cart_id(), product_id, quantity)
+    flash(f"{product.name} added to cart.", "success")
+    return redirect(url_for('product_detail', product_id=product_id))
+
+
+@route('/cart')
+@query_budget(3)
+def cart():
+    priced = priced_current_cart()
+    return render_template('cart.html', items=priced.items, total=priced.total)
+
+
+@route('/update_cart', methods=['POST'])
+def update_cart():
+    store = get_cart_store()
+    cart_id = current_cart_id()
+    for key in current_cart():
+        new_qty = request.form.get(f'qty_{key}')
+        if new_qty:
+            store.set_line(cart_id, int(key), int(new_qty))
+    flash("Cart updated.", "info")
+    return redirect(url_for('cart'))
+
+
+@route('/remove_from_cart/<int:product_id>')
+def remove_from_cart(product_id):
+    get_cart_store().remove_line(current_cart_id(), product_id)
+    flash("Item removed from cart.", "info")
+    return redirect(url_for('cart'))
+
+
+@route('/checkout', methods=['GET', 'POST'])
+@login_required
+@query_budget(10)
+def checkout():
+    if request.method == 'POST':
+        idempotency_key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+        if idempotency_key and len(idempotency_key) > 64:
+            # Same limit as the API and the column; the checkout page issues a fresh key
+            flash("Your checkout form has expired, please submit it again.", "danger")
+            return redirect(url_for('checkout'))
+        order = find_order(current_user.id, idempotency_key)
+        if order is None:
+            priced = priced_current_cart()
+            if not priced.items:
+                flash("Your cart is empty.", "info")
+                return redirect(url_for('cart'))
+            # Process payment here
+            try:
+                order, _ = place_order(current_user.id, priced, idempotency_key)
+            except OutOfStock as e:
+                names = ', '.join(item['product'].name for item in priced.items
+                                  if item['product'].id in e.product_ids)
+                flash(f"Sorry, not enough stock left for: {names}", "danger")
+                return redirect(url_for('cart'))
+            get_cart_store().clear(current_cart_id())
+        flash(f"Order #{order.id} placed successfully!", "success")
+        return redirect(url_for('home'))
+    priced = priced_current_cart()
+    if not priced.items:
+        flash("Your cart is empty.", "info")
+        return redirect(url_for('cart'))
+    return render_template('checkout.html', items=priced.items, total=priced.total,
+                           idempotency_key=secrets.token_urlsafe(24))
+
+
+@route('/profile', methods=['GET', 'POST'])
+@login_required
+@query_budget(7)  # POST with an email and password change
+def profile():
+    # current_user is a cached, read-only Identity; the form needs the full row
+    user = User.query.get_or_404(current_user.id)
+    if request.method == 'POST':
+        # Update user details
+        user.first_name = request.form.get('first_name')
+        user.last_name = request.form.get('last_name')
+        user.display_name = request.form.get('display_name')
+        user.date_of_birth = request.form.get('date_of_birth')
+        user.address_line1 = request.form.get('address_line1')
+        user.address_line2 = request.form.get('address_line2')
+        user.city = request.form.get('city')
+        user.state = request.form.get('state')
+        user.zip_code = request.form.get('zip_code')
+        user.country = request.form.get('country')
+        user.phone_number = request.form.get('phone_number')
+
+        # Handle email changes (optional)
+        new_email = request.form.get('email')
+        if new_email and new_email != user.email:
+            if not change_email(user, new_email):
+                flash("Email already in use", "danger")
+                return redirect(url_for('profile'))
+
+        # Handle password change if requested
+        old_password = request.form.get('old_password')
+        new_password = request.form.get('new_password')
+        confirm_new_password = request.form.get('confirm_new_password')
+
+        if new_password or confirm_new_password:
+            # If either is provided, validate old password and confirm match
+            if not old_password or not password_hasher.check_password_hash(user.password, old_password):
+                flash("Old password is incorrect.", "danger")
+                return redirect(url_for('profile'))
+            if new_password != confirm_new_password:
+                flash("New passwords do not match.", "danger")
+                return redirect(url_for('profile'))
+            # Update password
+            user.password = password_hasher.generate_password_hash(new_password)
+
+        db.session.commit()
+        invalidate_user(current_user.id)
+        flash("Profile updated successfully.", "success")
+        return redirect(url_for('profile'))
+
+    orders_after = request.args.get('orders_after')
+    try:
+        orders, orders_next = order_history_page(user.id, after=orders_after)
+    except ValueError:
+        return redirect(url_for('profile'))
+    return render_template('profile.html', user=user, orders=orders,
+                           orders_after=orders_after, orders_next=orders_next)